@@ -0,0 +1,272 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from excel_reader import COLUMNS_NEEDED, canonicalize, read_inventory
+from inventory_core import article_is_text, ingest, low_articles, parse_pool, parse_uploads, zero_articles
+from rules import FilterRules
+
+DEFAULT_OUT_DIR = "bench_results"
+DEFAULT_DATA_DIR = os.path.join(tempfile.gettempdir(), "inventory_bench")
+
+# Share of alphanumeric article codes per data shape. One such code turns the
+# whole Article column into text, so each shape times a different code path.
+SHAPES = {"numeric": 0.0, "alphanumeric": 0.02}
+
+# Ordinary categories per raw department; banned ones are mixed in from the rules
+CATEGORIES = {
+    "Grocery": ["Canned Goods", "Cereal", "Pasta/ Rice", "Snacks", "Beverages", "Condiments", "Baking"],
+    "Meat": ["Beef", "Pork", "Chicken", "Ground Meat"],
+    "Deli": ["Sliced Meats", "Cheese", "Prepared Salads"],
+    "Bakery Commercial": ["Bread", "Buns", "Cakes"],
+    "Bakery Instore": ["Fresh Bread", "Pastry", "Cookies"],
+    "Bulk": ["Milk", "Yogurt", "Frozen Meals", "Ice Cream", "Frozen Veg"],
+    "Seafood": ["Fresh Fish", "Shellfish", "Frozen Seafood"],
+    "HMR": ["Hot Meals", "Sushi", "Sandwiches"],
+    "Produce": ["Apples", "Citrus", "Berries", "Bananas"],
+    "Home": ["Cleaning", "Paper", "Kitchen"],
+    "Entertainment": ["Cards", "Toys", "Seasonal"],
+}
+
+
+# ----------------- Synthetic Data -----------------
+def generate_inventory(articles, seed=0, rules=None, coded_share=0.0):
+    """
+    A store-shaped inventory frame with COLUMNS_NEEDED:
+      - departments from the rules' light groups, weighted like a real store
+      - ~8% of rows in a banned category (prefixes from the rules)
+      - ~10% zeros/negatives, ~15% lows, ~1% blank inventory
+      - numeric article codes, except `coded_share` of them alphanumeric
+    """
+    rules = rules or FilterRules.from_config({})
+    rng = np.random.default_rng(seed)
+    departments = [dep for members in rules.departments.values() for dep in members]
+    weights = np.array([5.0 if dep == "Grocery" else 1.0 for dep in departments])
+    dept = rng.choice(departments, size=articles, p=weights / weights.sum())
+
+    category = np.empty(articles, dtype=object)
+    for name in np.unique(dept):
+        rows = np.flatnonzero(dept == name)
+        category[rows] = rng.choice(CATEGORIES.get(name, ["General"]), size=len(rows))
+    banned = rng.random(articles) < 0.08
+    if rules.banned_prefixes:
+        category[banned] = [p + " Misc" for p in rng.choice(rules.banned_prefixes, size=banned.sum())]
+
+    numbers = rng.choice(np.arange(100000, 100000 + articles * 20), size=articles, replace=False)
+    article = numbers.astype(object)
+    coded = rng.random(articles) < coded_share
+    article[coded] = [f"X{n}" for n in numbers[coded]]
+
+    inventory = rng.gamma(2.0, 12.0, size=articles).round()
+    roll = rng.random(articles)
+    inventory[roll < 0.10] = rng.integers(-3, 1, size=(roll < 0.10).sum())
+    inventory[(roll >= 0.10) & (roll < 0.25)] = rng.integers(1, 3, size=((roll >= 0.10) & (roll < 0.25)).sum())
+    inventory[roll > 0.99] = np.nan
+
+    return pd.DataFrame({
+        "Department": dept,
+        "Merchandise Category": category,
+        "Article Description": [f"Item {n} {d[:8]}" for n, d in zip(numbers, dept)],
+        "Article": article,
+        "Inventory": inventory,
+    })[COLUMNS_NEEDED]
+
+
+def write_workbooks(df, out_dir):
+    """One .xlsx per department, the way the store exports them. Returns the paths."""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for department, rows in df.groupby("Department"):
+        path = os.path.join(out_dir, f"{department.replace(' ', '_')}.xlsx")
+        rows.to_excel(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def workbooks_for(articles, seed, shape="numeric", data_dir=DEFAULT_DATA_DIR):
+    """Generated workbooks for (articles, seed, shape), reused across runs since writing xlsx is slow."""
+    out_dir = os.path.join(data_dir, f"{articles}-{seed}-{shape}")
+    marker = os.path.join(out_dir, "frame.pkl")
+    if os.path.exists(marker):
+        return pd.read_pickle(marker), sorted(
+            os.path.join(out_dir, n) for n in os.listdir(out_dir) if n.endswith(".xlsx")
+        )
+    df = generate_inventory(articles, seed, coded_share=SHAPES[shape])
+    paths = write_workbooks(df, out_dir)
+    df.to_pickle(marker)
+    return df, paths
+
+
+# ----------------- Timing -----------------
+def timed(fn, repeat=3, setup=None):
+    """Runs fn `repeat` times; returns {"best", "median", "runs"} in seconds."""
+    runs = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - started)
+    return {"best": min(runs), "median": statistics.median(runs), "runs": runs}
+
+
+def bench_parsing(paths, rules, repeat):
+    results = {}
+    results["parse_xlsx"] = timed(lambda: [read_inventory(p, cache_dir=None) for p in paths], repeat)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        [read_inventory(p, cache_dir) for p in paths]  # warm
+        results["parse_cached"] = timed(lambda: [read_inventory(p, cache_dir) for p in paths], repeat)
+
+    pool = parse_pool(len(paths))
+    try:
+        results["parse_parallel"] = timed(lambda: parse_uploads(paths, rules, pool, cache_dir=None), repeat)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return results
+
+
+def bench_filters(df, rules, repeat):
+    df = canonicalize(df)  # the shape read_inventory hands the filters
+    numeric = pd.to_numeric(df["Article"], errors="coerce").dropna().astype("int64").to_numpy()
+    dno = np.sort(np.random.default_rng(1).choice(numeric, size=len(numeric) // 20, replace=False))
+    if article_is_text(df):
+        dno = np.sort(dno.astype(str)).astype(object)
+    filtered = rules.filter_banned(df)
+    return {
+        "filter_banned": timed(lambda: rules.filter_banned(df), repeat),
+        "find_zeros": timed(lambda: zero_articles(filtered, dno), repeat),
+        "find_lows": timed(lambda: low_articles(filtered, rules), repeat),
+    }
+
+
+# Minimal copies of the server tables, created in a throwaway schema
+BENCH_SCHEMA = """
+CREATE TABLE products (
+    id serial PRIMARY KEY,
+    article_number varchar(25) NOT NULL UNIQUE,
+    description varchar(50),
+    department varchar(25),
+    category varchar(25),
+    active boolean DEFAULT true
+);
+CREATE TABLE dno (
+    article varchar(25) PRIMARY KEY,
+    active boolean NOT NULL DEFAULT true
+);
+"""
+
+
+def bench_ingest(df, rules, db_config):
+    """
+    Times a first send (every product new), an unchanged re-send and a
+    re-send with 5% of rows changed. Everything lives in a temporary
+    schema that is dropped afterwards, so any database will do.
+    """
+    from db_pool import ConnectionManager
+    from sent_log import SentLog
+
+    schema = f"inventory_bench_{os.getpid()}"
+    db = ConnectionManager({**db_config, "options": f"-c search_path={schema}"})
+    results = {}
+    with tempfile.TemporaryDirectory() as state_dir:
+        sent_log = SentLog(os.path.join(state_dir, "ingest_state.db"))
+        try:
+            with db.session() as (cur, conn):
+                cur.execute(f"CREATE SCHEMA {schema}")
+                cur.execute(BENCH_SCHEMA)
+
+            filtered = rules.filter_banned(canonicalize(df))
+            results["ingest_first"] = timed(lambda: ingest(db, filtered, sent_log, rules), 1)
+            results["ingest_unchanged"] = timed(lambda: ingest(db, filtered, sent_log, rules), 1)
+
+            changed = filtered.copy()
+            rows = np.random.default_rng(2).random(len(changed)) < 0.05
+            changed.loc[rows, "Inventory"] = changed.loc[rows, "Inventory"].fillna(0) + 1
+            results["ingest_5pct_changed"] = timed(lambda: ingest(db, changed, sent_log, rules), 1)
+        finally:
+            sent_log.close()
+            with db.session() as (cur, conn):
+                cur.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+            db.close_all()
+    return results
+
+
+# ----------------- Reports -----------------
+def git_version():
+    try:
+        return subprocess.check_output(
+            ["git", "describe", "--always", "--dirty"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current, previous_path):
+    """Prints median ratios current/previous for every benchmark both runs have."""
+    previous = json.load(open(previous_path))["results"]
+    for size, benches in current["results"].items():
+        for name, timing in benches.items():
+            before = previous.get(size, {}).get(name)
+            if before:
+                ratio = timing["median"] / before["median"]
+                flag = "  <-- slower" if ratio > 1.2 else ""
+                print(f"{size:>18} {name:<22} {ratio:6.2f}x{flag}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the inventory hot paths on synthetic data.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 20000, 200000], help="articles per run")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--shapes", nargs="+", choices=list(SHAPES), default=list(SHAPES),
+                        help="article code shapes to run (default: both)")
+    parser.add_argument("--db-config", help="config.json of a Postgres to run the ingest benchmarks against")
+    parser.add_argument("--out-dir", default=DEFAULT_OUT_DIR)
+    parser.add_argument("--compare", metavar="RESULT_JSON", help="earlier result file to compare against")
+    args = parser.parse_args()
+
+    rules = FilterRules.from_config({})
+    db_config = json.load(open(args.db_config)) if args.db_config else None
+
+    report = {
+        "version": git_version(),
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "cpus": os.cpu_count(),
+        "results": {},
+    }
+    for size in args.sizes:
+        for shape in args.shapes:
+            df, paths = workbooks_for(size, args.seed, shape)
+            results = {}
+            results.update(bench_parsing(paths, rules, args.repeat))
+            results.update(bench_filters(df, rules, args.repeat))
+            if db_config:
+                results.update(bench_ingest(df, rules, db_config))
+            # Numeric runs keep the bare size as their key, so --compare still lines up with older reports
+            label = str(size) if shape == "numeric" else f"{size}/{shape}"
+            report["results"][label] = results
+            for name, timing in results.items():
+                print(f"{label:>18} {name:<22} best {timing['best']:.4f}s  median {timing['median']:.4f}s")
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    out_path = os.path.join(args.out_dir, f"{datetime.now():%Y%m%d-%H%M%S}-{report['version']}.json")
+    with open(out_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {out_path}")
+
+    if args.compare:
+        compare(report, args.compare)
@@ -0,0 +1,153 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+
+# Keys of config.json that are passed on to psycopg2.connect
+CONNECT_KEYS = ("host", "dbname", "user", "password", "port", "options")
+
+
+class ServerUnavailable(Exception):
+    """Raised when no connection could be made after all retries."""
+
+
+class ConnectionManager:
+    """
+    Small thread-safe pool of psycopg2 connections shared by the app,
+    the inventory pipeline and the DNO scripts.
+
+      - Idle connections are reused (a pool "hit"); a new connection is only
+        opened when none is idle (a pool "miss").
+      - A connection that has been idle longer than health_check_after
+        seconds is pinged with SELECT 1 before being handed out.
+      - Connecting retries with exponential backoff.
+      - session(timeout_ms=...) sets a per-operation statement_timeout.
+    """
+
+    def __init__(self, db_config, maxconn=4, retries=3, backoff=0.5,
+                 health_check_after=30, connect_timeout=10):
+        self.params = {k: db_config[k] for k in CONNECT_KEYS if k in db_config}
+        self.params["connect_timeout"] = connect_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.health_check_after = health_check_after
+
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._idle = []  # [(conn, last_used)]
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.reconnects = 0
+        self.failed_health_checks = 0
+
+    # ----------------- Connect & Health -----------------
+    def _connect(self):
+        delay = self.backoff
+        for attempt in range(self.retries + 1):
+            try:
+                return psycopg2.connect(**self.params)
+            except psycopg2.OperationalError as e:
+                if attempt == self.retries:
+                    raise ServerUnavailable(str(e)) from e
+                self.reconnects += 1
+                time.sleep(delay)
+                delay *= 2
+
+    def _is_healthy(self, conn, last_used):
+        if conn.closed:
+            return False
+        if time.time() - last_used < self.health_check_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    # ----------------- Acquire & Release -----------------
+    def acquire(self):
+        self._slots.acquire()
+        try:
+            while True:
+                with self._lock:
+                    if not self._idle:
+                        break
+                    conn, last_used = self._idle.pop()
+                if self._is_healthy(conn, last_used):
+                    self.hits += 1
+                    return conn
+                self.failed_health_checks += 1
+                self._discard(conn)
+
+            self.misses += 1
+            return self._connect()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn, broken=False):
+        try:
+            if broken or conn.closed:
+                self._discard(conn)
+                return
+            with self._lock:
+                self._idle.append((conn, time.time()))
+        finally:
+            self._slots.release()
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    @contextmanager
+    def session(self, timeout_ms=None):
+        """
+        Yields (cursor, conn) on a pooled connection.
+        Commits on success, rolls back on error, then returns the connection
+        to the pool (or drops it if it broke).
+        """
+        conn = self.acquire()
+        broken = False
+        cur = conn.cursor()
+        try:
+            if timeout_ms:
+                cur.execute("SET LOCAL statement_timeout = %s", (int(timeout_ms),))
+            yield cur, conn
+            conn.commit()
+        except BaseException as e:
+            broken = bool(conn.closed) or isinstance(e, psycopg2.InterfaceError)
+            if not conn.closed:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    broken = True
+            raise
+        finally:
+            if not cur.closed:
+                cur.close()
+            self.release(conn, broken=broken)
+
+    # ----------------- Stats & Shutdown -----------------
+    def stats(self):
+        with self._lock:
+            idle = len(self._idle)
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "reconnects": self.reconnects,
+            "failed_health_checks": self.failed_health_checks,
+            "idle": idle,
+        }
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._discard(conn)
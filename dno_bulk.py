@@ -0,0 +1,211 @@
+import argparse
+import csv
+import io
+import json
+import os
+import re
+import sys
+from collections import namedtuple
+from datetime import datetime, timezone
+
+import pandas as pd
+import psycopg2
+
+from db_pool import ConnectionManager, ServerUnavailable
+from dno_cache import ensure_server_schema
+
+# Article codes are digits, sometimes with a letter prefix; anything else
+# (stray text, prices, blank cells) is reported instead of sent
+ARTICLE_PATTERN = re.compile(r"[0-9A-Za-z-]{1,25}")
+HEADER_NAMES = {"article", "article #", "article number", "article_number", "articles"}
+PREVIEW = 20  # unknown/invalid articles listed in a summary
+
+# One classified row per requested article, in a single pass over products and dno
+VALIDATE_QUERY = """
+SELECT s.article, p.article_number IS NOT NULL AS known, d.active
+FROM staging_dno_bulk s
+LEFT JOIN products p ON p.article_number = s.article
+LEFT JOIN dno d ON d.article = s.article
+"""
+
+# Only articles the store actually carries can become DNO. Edits carry the
+# client's clock, like journaled single edits, and follow the same last-writer-wins
+# rule, so a newer edit from another workstation is never overwritten.
+BULK_ACTIVATE = """
+INSERT INTO dno (article, active, updated_at)
+SELECT s.article, TRUE, %(at)s
+FROM staging_dno_bulk s
+JOIN products p ON p.article_number = s.article
+ON CONFLICT (article) DO UPDATE
+SET active = TRUE, updated_at = EXCLUDED.updated_at
+WHERE NOT dno.active AND dno.updated_at < EXCLUDED.updated_at
+"""
+
+# Deactivation goes by the dno table, so delisted articles can still be cleared
+BULK_DEACTIVATE = """
+UPDATE dno d
+SET active = FALSE, updated_at = %(at)s
+FROM staging_dno_bulk s
+WHERE d.article = s.article AND d.active AND d.updated_at < %(at)s
+"""
+
+BulkPlan = namedtuple("BulkPlan", ["active", "requested", "to_change", "unchanged", "unknown", "invalid"])
+
+
+# ----------------- Reading Lists -----------------
+def normalize_article(value):
+    """'12345', 12345 and 12345.0 (Excel) all become '12345'; blanks become ''."""
+    if value is None or (isinstance(value, float) and value != value):
+        return ""
+    text = str(value).strip()
+    if re.fullmatch(r"\d+\.0+", text):
+        text = text.split(".")[0]
+    return text
+
+
+def first_column(rows):
+    """
+    The article column of a list of rows: the one headed "Article" (or
+    similar) if the first row is a header, otherwise the first column.
+    """
+    rows = [row for row in rows if row]
+    if not rows:
+        return []
+    header = [normalize_article(cell).lower() for cell in rows[0]]
+    for idx, name in enumerate(header):
+        if name in HEADER_NAMES:
+            return [row[idx] if idx < len(row) else None for row in rows[1:]]
+    return [row[0] for row in rows]
+
+
+def read_article_list(path):
+    """
+    Reads a .txt (one article per line), .csv or .xlsx list. Returns
+    (articles, invalid): valid codes de-duplicated in file order, and the
+    non-blank entries that don't look like an article.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".xlsx", ".xls"):
+        frame = pd.read_excel(path, header=None, dtype=object)
+        values = first_column(frame.values.tolist())
+    elif ext == ".csv":
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            values = first_column(list(csv.reader(f)))
+    else:
+        with open(path, encoding="utf-8-sig") as f:
+            values = first_column([[line] for line in f if not line.lstrip().startswith("#")])
+
+    articles, invalid, seen = [], [], set()
+    for value in values:
+        article = normalize_article(value)
+        if not article:
+            continue
+        if not ARTICLE_PATTERN.fullmatch(article):
+            invalid.append(article)
+        elif article not in seen:
+            seen.add(article)
+            articles.append(article)
+    return articles, invalid
+
+
+# ----------------- Server Side -----------------
+def stage_articles(cur, articles):
+    """COPY the articles into a transaction-scoped temp table in one round trip."""
+    cur.execute("""
+        CREATE TEMP TABLE staging_dno_bulk (
+            article varchar(25) PRIMARY KEY
+        ) ON COMMIT DROP
+    """)
+    cur.copy_expert("COPY staging_dno_bulk FROM STDIN", io.StringIO("".join(a + "\n" for a in articles)))
+
+
+def validate(cur, articles, active, invalid=()):
+    """
+    Stages the list and classifies every article in one join. Nothing is
+    written; the staging table goes away with the transaction.
+    """
+    stage_articles(cur, articles)
+    cur.execute(VALIDATE_QUERY)
+    to_change, unchanged, unknown = [], [], []
+    for article, known, current in cur.fetchall():
+        if active:
+            if not known:
+                unknown.append(article)
+            elif current:
+                unchanged.append(article)
+            else:
+                to_change.append(article)
+        else:
+            if current:
+                to_change.append(article)
+            elif known or current is not None:
+                unchanged.append(article)
+            else:
+                unknown.append(article)
+    return BulkPlan(active, len(articles), sorted(to_change), sorted(unchanged), sorted(unknown), list(invalid))
+
+
+def apply_bulk(cur, articles, active, at=None):
+    """
+    Stages the list again and applies it with one statement, inside the
+    caller's transaction. Re-checks against the live tables, so rows changed
+    since validation are handled correctly. Every row is stamped `at`
+    (default: now on this machine, in UTC). Returns the rows changed.
+    """
+    ensure_server_schema(cur)
+    stage_articles(cur, articles)
+    at = at or datetime.now(timezone.utc)
+    cur.execute(BULK_ACTIVATE if active else BULK_DEACTIVATE, {"at": at})
+    return cur.rowcount
+
+
+def summary_text(plan):
+    """The one confirmation message shown for a whole list."""
+    verb = "add to" if plan.active else "remove from"
+    lines = [
+        f"{plan.requested} article(s) in the file.",
+        f"{len(plan.to_change)} will be {'added to' if plan.active else 'removed from'} DNO.",
+        f"{len(plan.unchanged)} already {'in' if plan.active else 'not in'} DNO (skipped).",
+    ]
+    if plan.unknown:
+        reason = "not in products" if plan.active else "never in DNO"
+        lines.append(f"{len(plan.unknown)} unknown ({reason}, skipped): {_preview(plan.unknown)}")
+    if plan.invalid:
+        lines.append(f"{len(plan.invalid)} unreadable entries (skipped): {_preview(plan.invalid)}")
+    if plan.to_change:
+        lines.append(f"\n{verb.capitalize()} DNO now?")
+    return "\n".join(lines)
+
+
+def _preview(articles):
+    shown = ", ".join(articles[:PREVIEW])
+    return shown + (f" ... (+{len(articles) - PREVIEW} more)" if len(articles) > PREVIEW else "")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk DNO activation/deactivation from a .txt/.csv/.xlsx list.")
+    parser.add_argument("action", choices=["add", "remove"])
+    parser.add_argument("file")
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--yes", action="store_true", help="apply the changes; without it only the summary is shown")
+    args = parser.parse_args()
+
+    active = args.action == "add"
+    articles, invalid = read_article_list(args.file)
+    db = ConnectionManager(json.load(open(args.config)))
+    try:
+        with db.session() as (cur, conn):
+            plan = validate(cur, articles, active, invalid)
+        result = {**plan._asdict(), "to_change": len(plan.to_change), "unchanged": len(plan.unchanged)}
+        if args.yes and plan.to_change:
+            with db.session() as (cur, conn):
+                result["applied"] = apply_bulk(cur, plan.to_change, active)
+        print(json.dumps(result, indent=2))
+    except ServerUnavailable as e:
+        print(f"Could not connect to PostgreSQL: {e}")
+        sys.exit(1)
+    except psycopg2.Error as e:
+        print(f"PostgreSQL error: {e}")
+        sys.exit(1)
+    finally:
+        db.close_all()
@@ -0,0 +1,200 @@
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+# Local cache file, kept next to config.json
+DEFAULT_CACHE_PATH = "dno_cache.db"
+
+# Server-side watermark columns for the dno table.
+# Every insert takes a fresh revision from the sequence (column default),
+# every update takes a fresh one from the trigger. A revision is drawn when
+# the row is written, not when its transaction commits, so with concurrent
+# writers a lower revision can become visible after a sync has moved past
+# it. Each row therefore also records the (64-bit) id of the transaction
+# that wrote it: every row committed after a sync was written by a
+# transaction at or above that sync's snapshot xmin, so the next sync asks
+# for "revision > watermark OR writer_xid >= previous xmin".
+SERVER_SCHEMA = """
+CREATE SEQUENCE IF NOT EXISTS dno_revision_seq;
+
+ALTER TABLE dno ADD COLUMN IF NOT EXISTS revision bigint NOT NULL DEFAULT nextval('dno_revision_seq');
+ALTER TABLE dno ADD COLUMN IF NOT EXISTS updated_at timestamptz NOT NULL DEFAULT now();
+ALTER TABLE dno ADD COLUMN IF NOT EXISTS writer_xid bigint NOT NULL DEFAULT txid_current();
+
+CREATE INDEX IF NOT EXISTS dno_revision_idx ON dno (revision);
+CREATE INDEX IF NOT EXISTS dno_writer_xid_idx ON dno (writer_xid);
+
+CREATE OR REPLACE FUNCTION dno_touch() RETURNS trigger AS $$
+BEGIN
+    NEW.revision := nextval('dno_revision_seq');
+    NEW.writer_xid := txid_current();
+    IF NEW.updated_at IS NOT DISTINCT FROM OLD.updated_at THEN
+        NEW.updated_at := now();
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS dno_touch ON dno;
+CREATE TRIGGER dno_touch BEFORE UPDATE ON dno
+    FOR EACH ROW EXECUTE FUNCTION dno_touch();
+"""
+
+
+def ensure_server_schema(cur):
+    """
+    Adds the revision/updated_at/writer_xid watermark to the remote dno
+    table if it is missing. Cheap no-op once the migration has run.
+    """
+    cur.execute("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'dno' AND column_name = 'writer_xid'
+    """)
+    if cur.fetchone() is None:
+        cur.execute(SERVER_SCHEMA)
+
+
+class DNOCache:
+    """
+    Persistent local copy of the *active* DNO articles.
+
+    The articles live in a small SQLite file and in memory as a set plus a
+    sorted int64 array (for fast isin filtering). sync() only pulls the rows
+    whose server revision is above the last one we have seen, plus any row
+    whose transaction was still open at the previous sync (see SERVER_SCHEMA).
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()  # sync() may run on a worker thread
+        self.conn.execute("CREATE TABLE IF NOT EXISTS dno (article TEXT PRIMARY KEY)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)")
+        self.conn.commit()
+
+        self.watermark = int(self._get_meta("watermark", 0))
+        self.xmin = int(self._get_meta("xmin", 0))  # snapshot xmin of the last sync
+        self.last_sync = float(self._get_meta("last_sync", 0.0))
+        self._articles = {r[0] for r in self.conn.execute("SELECT article FROM dno")}
+        self._array = self._str_array = None
+
+    # ----------------- Meta Helpers -----------------
+    def _get_meta(self, key, default):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, key, value):
+        self.conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+            (key, value)
+        )
+
+    # ----------------- Sync -----------------
+    def sync(self, cur):
+        """
+        Pulls every dno row changed since our watermark and applies it locally.
+        Rows seen before may come back (late commits are re-checked); applying
+        them again is harmless. Returns the number of rows pulled.
+        """
+        with self._lock:
+            return self._sync(cur)
+
+    def _sync(self, cur):
+        ensure_server_schema(cur)
+        # Taken before the read: anything this read can't see yet was written
+        # by a transaction at or above this xmin, so the next sync catches it
+        cur.execute("SELECT txid_snapshot_xmin(txid_current_snapshot())")
+        xmin = cur.fetchone()[0]
+        cur.execute(
+            "SELECT article, active, revision FROM dno WHERE revision > %s OR writer_xid >= %s ORDER BY revision",
+            (self.watermark, self.xmin)
+        )
+        rows = cur.fetchall()
+
+        activated = [(str(a),) for a, active, _ in rows if active]
+        deactivated = [(str(a),) for a, active, _ in rows if not active]
+
+        with self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO dno (article) VALUES (?)", activated)
+            self.conn.executemany("DELETE FROM dno WHERE article = ?", deactivated)
+            if rows:
+                self.watermark = max(self.watermark, rows[-1][2])
+                self._set_meta("watermark", self.watermark)
+            self.xmin = xmin
+            self._set_meta("xmin", self.xmin)
+            self.last_sync = time.time()
+            self._set_meta("last_sync", self.last_sync)
+
+        if rows:
+            self._articles.update(a for (a,) in activated)
+            self._articles.difference_update(a for (a,) in deactivated)
+            self._array = self._str_array = None
+        return len(rows)
+
+    def apply_local(self, article, active):
+        """
+        Applies a DNO edit made on this machine right away, before the server
+        has it. The watermark is left alone, so the next sync still pulls the
+        server's version of the row.
+        """
+        article = str(article)
+        with self._lock, self.conn:
+            if active:
+                self.conn.execute("INSERT OR IGNORE INTO dno (article) VALUES (?)", (article,))
+                self._articles.add(article)
+            else:
+                self.conn.execute("DELETE FROM dno WHERE article = ?", (article,))
+                self._articles.discard(article)
+            self._array = self._str_array = None
+
+    def is_stale(self, max_age):
+        return time.time() - self.last_sync > max_age
+
+    def reset(self):
+        """Forgets everything so the next sync is a full reload."""
+        with self.conn:
+            self.conn.execute("DELETE FROM dno")
+            self.conn.execute("DELETE FROM meta")
+        self.watermark = 0
+        self.xmin = 0
+        self.last_sync = 0.0
+        self._articles = set()
+        self._array = self._str_array = None
+
+    # ----------------- Lookups -----------------
+    def __contains__(self, article):
+        return str(article) in self._articles
+
+    def __len__(self):
+        return len(self._articles)
+
+    def as_int_array(self):
+        """
+        Active articles as a sorted int64 array, ready for Series.isin.
+        Non-numeric article codes are skipped.
+        """
+        if self._array is None:
+            numeric = [int(a) for a in self._articles if a.isdigit()]
+            self._array = np.array(sorted(numeric), dtype=np.int64)
+        return self._array
+
+    def as_str_array(self):
+        """
+        Every active article as a sorted str array, alphanumeric codes
+        included -- for frames whose Article column is text.
+        """
+        if self._str_array is None:
+            self._str_array = np.array(sorted(self._articles), dtype=object)
+        return self._str_array
+
+    def close(self):
+        self.conn.close()
+
+
+def cache_path_for(config_path="config.json"):
+    """Returns the cache file path that sits next to the given config file."""
+    return os.path.join(os.path.dirname(os.path.abspath(config_path)), DEFAULT_CACHE_PATH)
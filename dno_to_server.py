@@ -1,74 +1,252 @@
+import argparse
+import hashlib
+import io
 import json
 import sqlite3
+import time
+
 import psycopg2
-from psycopg2 import sql, extras
 
-# PostgreSQL DB config
-db_config = json.load(open('config.json'))
+from db_pool import ConnectionManager, ServerUnavailable
+from dno_cache import ensure_server_schema
 
-def upload_dno_to_postgres(sqlite_path="dno.db"):
+# Articles are bucketed by their last two characters on both sides, so the
+# two lists can be compared ~100 hashes at a time instead of row by row.
+BUCKET_CHARS = 2
+
+# Store-side dno.db: every row carries active + updated_ms (UTC epoch ms).
+#   - a DELETE becomes a tombstone (active = 0), so removals can be synced
+#   - re-adding a tombstoned article revives it
+#   - any local change without an explicit updated_ms is stamped "now"
+# Rows that predate this migration keep updated_ms = 0: unknown age, so
+# the server's copy wins whenever it has one.
+NOW_MS = "CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)"
+LOCAL_SCHEMA = f"""
+CREATE UNIQUE INDEX IF NOT EXISTS dno_article_idx ON dno (article);
+
+CREATE TRIGGER IF NOT EXISTS dno_stamp_insert AFTER INSERT ON dno WHEN NEW.updated_ms = 0
+BEGIN
+    UPDATE dno SET updated_ms = {NOW_MS} WHERE rowid = NEW.rowid;
+END;
+
+CREATE TRIGGER IF NOT EXISTS dno_stamp_update AFTER UPDATE OF active ON dno
+WHEN NEW.updated_ms = OLD.updated_ms
+BEGIN
+    UPDATE dno SET updated_ms = {NOW_MS} WHERE rowid = NEW.rowid;
+END;
+
+CREATE TRIGGER IF NOT EXISTS dno_tombstone BEFORE DELETE ON dno
+BEGIN
+    UPDATE dno SET active = 0 WHERE article = OLD.article AND active = 1;
+    SELECT RAISE(IGNORE);
+END;
+
+CREATE TRIGGER IF NOT EXISTS dno_revive BEFORE INSERT ON dno
+WHEN EXISTS (SELECT 1 FROM dno WHERE article = NEW.article)
+BEGIN
+    UPDATE dno SET active = 1 WHERE article = NEW.article AND active = 0;
+    SELECT RAISE(IGNORE);
+END;
+"""
+
+CREATE_SERVER_TABLE = """
+CREATE TABLE IF NOT EXISTS dno (
+    article VARCHAR(25) NOT NULL,
+    active BOOLEAN NOT NULL DEFAULT TRUE,
+    PRIMARY KEY (article)
+);
+"""
+
+# Same row text and order as row_text()/bucket_hashes() below; COLLATE "C" sorts by byte like Python
+SERVER_ROW = """article || ':' || active::int || ':' || (extract(epoch FROM updated_at) * 1000)::bigint"""
+SERVER_BUCKET_HASHES = f"""
+SELECT right(article, {BUCKET_CHARS}) AS bucket,
+       md5(string_agg({SERVER_ROW}, ',' ORDER BY article COLLATE "C"))
+FROM dno
+GROUP BY 1
+"""
+SERVER_BUCKET_ROWS = """
+SELECT article, active, (extract(epoch FROM updated_at) * 1000)::bigint
+FROM dno
+WHERE right(article, %s) = ANY(%s)
+"""
+
+# Newer edit wins; the server row is left alone if it changed meanwhile
+PUSH_UPSERT = """
+INSERT INTO dno (article, active, updated_at)
+SELECT article, active, to_timestamp(updated_ms / 1000.0)
+FROM staging_dno
+ON CONFLICT (article) DO UPDATE
+SET active = EXCLUDED.active, updated_at = EXCLUDED.updated_at
+WHERE dno.updated_at < EXCLUDED.updated_at
+"""
+
+
+# ----------------- Store Side -----------------
+def ensure_local_schema(conn):
+    """Migrates a plain dno(article) table in place; a no-op once done."""
+    conn.execute("CREATE TABLE IF NOT EXISTS dno (article TEXT PRIMARY KEY)")
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(dno)")}
+    with conn:
+        if "active" not in columns:
+            conn.execute("ALTER TABLE dno ADD COLUMN active INTEGER NOT NULL DEFAULT 1")
+        if "updated_ms" not in columns:
+            conn.execute("ALTER TABLE dno ADD COLUMN updated_ms INTEGER NOT NULL DEFAULT 0")
+            # Legacy lists can hold duplicates; keep one row each before the unique index
+            conn.execute("DELETE FROM dno WHERE rowid NOT IN (SELECT min(rowid) FROM dno GROUP BY article)")
+    conn.executescript(LOCAL_SCHEMA)
+
+
+def load_local(conn):
+    """{article: (active, updated_ms)} for every row, tombstones included."""
+    return {
+        str(article): (bool(active), int(updated_ms))
+        for article, active, updated_ms in conn.execute("SELECT article, active, updated_ms FROM dno")
+    }
+
+
+def bucket_of(article):
+    return article[-BUCKET_CHARS:]
+
+
+def row_text(article, active, updated_ms):
+    return f"{article}:{int(active)}:{updated_ms}"
+
+
+def bucket_hashes(rows):
+    """{bucket: md5 hex} over {article: (active, updated_ms)}, matching SERVER_BUCKET_HASHES."""
+    buckets = {}
+    for article in sorted(rows, key=lambda a: a.encode()):
+        buckets.setdefault(bucket_of(article), []).append(row_text(article, *rows[article]))
+    return {bucket: hashlib.md5(",".join(texts).encode()).hexdigest() for bucket, texts in buckets.items()}
+
+
+# ----------------- Diff -----------------
+def diff_rows(local, server):
+    """
+    Compares the two sides' rows for the differing buckets. Returns
+    (to_push, to_pull) as lists of (article, active, updated_ms).
+    The newer updated_ms wins; on a tie the server's copy is kept.
+    """
+    to_push, to_pull = [], []
+    for article in local.keys() | server.keys():
+        mine, theirs = local.get(article), server.get(article)
+        if mine == theirs:
+            continue
+        if theirs is None or (mine is not None and mine[1] > theirs[1]):
+            to_push.append((article, *mine))
+        else:
+            to_pull.append((article, *theirs))
+    return to_push, to_pull
+
+
+def push(cur, rows):
+    """COPY the winning local rows into a staging table and upsert them in one statement."""
+    buffer = io.StringIO()
+    for article, active, updated_ms in rows:
+        buffer.write(f"{article}\t{'t' if active else 'f'}\t{updated_ms}\n")
+    buffer.seek(0)
+    cur.execute("""
+        CREATE TEMP TABLE staging_dno (
+            article varchar(25),
+            active boolean,
+            updated_ms bigint
+        ) ON COMMIT DROP
+    """)
+    cur.copy_expert("COPY staging_dno FROM STDIN", buffer)
+    cur.execute(PUSH_UPSERT)
+    return cur.rowcount
+
+
+def pull(conn, rows, local):
+    """Applies the winning server rows to dno.db with their server timestamps."""
+    updates = [(int(active), updated_ms, article) for article, active, updated_ms in rows if article in local]
+    inserts = [(article, int(active), updated_ms) for article, active, updated_ms in rows if article not in local]
+    with conn:
+        conn.executemany("UPDATE dno SET active = ?, updated_ms = ? WHERE article = ?", updates)
+        conn.executemany("INSERT INTO dno (article, active, updated_ms) VALUES (?, ?, ?)", inserts)
+
+
+def sync_dno(db, sqlite_path="dno.db", dry_run=False):
+    """
+    Two-way sync between the store's dno.db and the server's dno table.
+
+    Both sides hash their rows per bucket; only buckets whose hashes differ
+    are fetched and compared article by article. Newer edits win in both
+    directions, and deactivations travel as tombstones (active = false).
+    Returns a summary dict.
+    """
+    started = time.perf_counter()
+    conn = sqlite3.connect(sqlite_path)
     try:
-        # Connect to SQLite
-        sqlite_conn = sqlite3.connect(sqlite_path)
-        sqlite_cursor = sqlite_conn.cursor()
-
-        # Fetch articles from SQLite dno table
-        sqlite_cursor.execute("SELECT article FROM dno")
-        rows = sqlite_cursor.fetchall()
-        print(f"Number of articles fetched from SQLite: {len(rows)}")
-
-    except sqlite3.Error as e:
-        print(f"SQLite error: {e}")
-        return
+        ensure_local_schema(conn)
+        local = load_local(conn)
+        local_hashes = bucket_hashes(local)
+
+        with db.session() as (cur, pg_conn):
+            cur.execute(CREATE_SERVER_TABLE)
+            ensure_server_schema(cur)
+            cur.execute(SERVER_BUCKET_HASHES)
+            server_hashes = dict(cur.fetchall())
+
+            differing = sorted(
+                b for b in local_hashes.keys() | server_hashes.keys()
+                if local_hashes.get(b) != server_hashes.get(b)
+            )
+            to_push, to_pull = [], []
+            if differing:
+                cur.execute(SERVER_BUCKET_ROWS, (BUCKET_CHARS, differing))
+                server = {str(a): (bool(active), int(ms)) for a, active, ms in cur.fetchall()}
+                wanted = set(differing)
+                local_part = {a: v for a, v in local.items() if bucket_of(a) in wanted}
+                to_push, to_pull = diff_rows(local_part, server)
+
+            pushed = 0
+            if to_push and not dry_run:
+                pushed = push(cur, to_push)
+            if dry_run:
+                pg_conn.rollback()
+
+        if to_pull and not dry_run:
+            pull(conn, to_pull, local)
     finally:
-        if sqlite_conn:
-            sqlite_conn.close()
+        conn.close()
 
+    return {
+        "local_articles": len(local),
+        "buckets": len(local_hashes.keys() | server_hashes.keys()),
+        "differing_buckets": len(differing),
+        "to_server": len(to_push),
+        "applied_on_server": pushed,
+        "to_store": len(to_pull),
+        "deactivations_to_server": sum(1 for _, active, _ in to_push if not active),
+        "deactivations_to_store": sum(1 for _, active, _ in to_pull if not active),
+        "dry_run": dry_run,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def upload_dno_to_postgres(sqlite_path="dno.db"):
+    """Kept for old scripts: now a full two-way sync."""
+    db = ConnectionManager(json.load(open('config.json')))
     try:
-        # Connect to PostgreSQL
-        pg_conn = psycopg2.connect(**db_config)
-        pg_cursor = pg_conn.cursor()
-        print("Connected to PostgreSQL successfully.")
-
-        # Create dno table if it doesn't exist
-        create_table_query = """
-        CREATE TABLE IF NOT EXISTS dno (
-            article VARCHAR(25) NOT NULL,
-            active BOOLEAN NOT NULL DEFAULT TRUE,
-            PRIMARY KEY (article)
-        );
-        """
-        pg_cursor.execute(create_table_query)
-        pg_conn.commit()
-        print("Ensured that the dno table exists in PostgreSQL.")
-
-        # Prepare data for insertion
-        # Each row from SQLite is a tuple like (article,)
-        # We need to add the 'active' value as True
-        data_to_insert = [(article[0], True) for article in rows]
-
-        # Define the INSERT statement with ON CONFLICT to ignore duplicates
-        insert_query = """
-        INSERT INTO dno (article, active)
-        VALUES %s
-        ON CONFLICT (article) DO NOTHING;
-        """
-
-        # Use execute_values for efficient bulk insertion
-        extras.execute_values(
-            pg_cursor, insert_query, data_to_insert, template=None, page_size=100
-        )
-        pg_conn.commit()
-        print(f"Inserted {pg_cursor.rowcount} new articles into PostgreSQL dno table.")
+        return sync_dno(db, sqlite_path)
+    finally:
+        db.close_all()
+
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Two-way sync of the store's dno.db with the server's dno table.")
+    parser.add_argument("sqlite_path", nargs="?", default="dno.db")
+    parser.add_argument("--dry-run", action="store_true", help="report the differences without writing anything")
+    args = parser.parse_args()
+
+    db = ConnectionManager(json.load(open('config.json')))
+    try:
+        print(json.dumps(sync_dno(db, args.sqlite_path, args.dry_run), indent=2))
+    except ServerUnavailable as e:
+        print(f"Could not connect to PostgreSQL: {e}")
     except psycopg2.Error as e:
         print(f"PostgreSQL error: {e}")
     finally:
-        if pg_cursor:
-            pg_cursor.close()
-        if pg_conn:
-            pg_conn.close()
-            print("PostgreSQL connection closed.")
-
-if __name__ == "__main__":
-    upload_dno_to_postgres("dno.db")
+        db.close_all()
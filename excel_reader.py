@@ -0,0 +1,175 @@
+import hashlib
+import importlib.util
+import os
+
+import pandas as pd
+
+# The only columns the app ever looks at
+COLUMNS_NEEDED = ['Department', 'Merchandise Category', 'Article Description', 'Article', 'Inventory']
+
+# Explicit dtypes so the reader doesn't have to infer them cell by cell.
+# 'Article' is left to the engine: exports mix numeric and text codes.
+COLUMN_DTYPES = {
+    'Department': str,
+    'Merchandise Category': str,
+    'Article Description': str,
+    'Inventory': 'float64',
+}
+
+DEFAULT_CACHE_DIR = "excel_cache"
+MAX_CACHE_ENTRIES = 60  # roughly two months of daily department files
+
+# Canonical in-memory types, applied once at load time (see canonicalize)
+CATEGORY_COLUMNS = ['Department', 'Merchandise Category']
+INVENTORY_DTYPE = 'float32'
+
+# Bump when the parsed shape changes so stale cache entries are ignored
+READER_VERSION = "2"
+
+# Optional faster backends
+HAS_CALAMINE = importlib.util.find_spec("python_calamine") is not None
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+
+def pick_engine():
+    """calamine (Rust) parses xlsx several times faster than openpyxl when installed."""
+    return "calamine" if HAS_CALAMINE else "openpyxl"
+
+
+def file_digest(file_path, chunk_size=1 << 20):
+    """Content hash of the workbook, so a renamed copy still hits the cache."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def read_inventory(file_path, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Reads only COLUMNS_NEEDED from an inventory workbook.
+
+    The parsed frame is cached under cache_dir keyed by the file's content
+    hash (Parquet when pyarrow is available, pickle otherwise), so opening
+    the same daily file again skips the xlsx parse entirely.
+    """
+    cache_key = None
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        cache_key = os.path.join(cache_dir, f"{file_digest(file_path)}-v{READER_VERSION}")
+        cached = _load_cached(cache_key)
+        if cached is not None:
+            if not pd.api.types.is_integer_dtype(cached['Article']) and cached['Article'].dtype != object:
+                # Parquet hands text articles back as pandas' str dtype; keep the fresh-parse shape
+                cached['Article'] = cached['Article'].astype(object)
+            return cached
+
+    df = pd.read_excel(
+        file_path,
+        engine=pick_engine(),
+        usecols=COLUMNS_NEEDED,
+        dtype=COLUMN_DTYPES,
+    )
+    df = canonicalize(df[COLUMNS_NEEDED])
+
+    if cache_key:
+        _store_cached(df, cache_key)
+        _prune_cache(cache_dir)
+    return df
+
+
+# ----------------- Canonical Schema -----------------
+def _article_text(value):
+    # 12345.0 (a numeric cell read as float) and '12345' must be the same article
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def canonical_articles(articles):
+    """
+    int64 when every code is a whole number -- the common case, and what the
+    DNO array holds -- otherwise every code as a plain str, so a column never
+    mixes the two and isin/merge compare like with like.
+    """
+    if pd.api.types.is_integer_dtype(articles.dtype):
+        return articles.astype('int64')
+    numeric = pd.to_numeric(articles, errors='coerce')
+    if numeric.notna().all() and (numeric % 1 == 0).all():
+        return numeric.astype('int64')
+    return articles.map(_article_text).astype(object)
+
+
+def canonicalize(df):
+    """
+    The one in-memory shape every inventory frame has:
+      - Article: int64 (str for stores with alphanumeric codes); rows without one are dropped
+      - Department / Merchandise Category: categoricals (a few dozen values over many rows)
+      - Article Description: str
+      - Inventory: float32
+    """
+    df = df[df['Article'].notna()]
+    return pd.DataFrame({
+        'Department': df['Department'].astype('category'),
+        'Merchandise Category': df['Merchandise Category'].astype('category'),
+        'Article Description': df['Article Description'],
+        'Article': canonical_articles(df['Article']),
+        'Inventory': df['Inventory'].astype(INVENTORY_DTYPE),
+    }).reset_index(drop=True)
+
+
+def concat_inventory(frames):
+    """
+    Concatenates canonical frames and keeps them canonical: categoricals with
+    different categories, or int and str articles, would otherwise fall back to object.
+    """
+    combined = pd.concat(frames, ignore_index=True)
+    for column in CATEGORY_COLUMNS:
+        if not isinstance(combined[column].dtype, pd.CategoricalDtype):
+            combined[column] = combined[column].astype('category')
+    if not pd.api.types.is_integer_dtype(combined['Article']):
+        combined['Article'] = canonical_articles(combined['Article'])
+    return combined
+
+
+# ----------------- Parse Cache -----------------
+def _load_cached(cache_key):
+    for ext, reader in ((".parquet", pd.read_parquet), (".pkl", pd.read_pickle)):
+        path = cache_key + ext
+        if os.path.exists(path):
+            try:
+                df = reader(path)
+                os.utime(path)  # keep recently used entries out of the prune
+                return df
+            except Exception:
+                os.remove(path)  # corrupt entry, re-parse
+    return None
+
+
+def _store_cached(df, cache_key):
+    # Canonical frames never mix int and str articles, so Parquet can hold them all
+    if HAS_PYARROW:
+        path = cache_key + ".parquet"
+        df.to_parquet(path + ".tmp", index=False)
+    else:
+        path = cache_key + ".pkl"
+        df.to_pickle(path + ".tmp")
+    os.replace(path + ".tmp", path)
+
+
+def _mtime(path):
+    # Another parser process may prune or replace an entry mid-scan
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0.0
+
+
+def _prune_cache(cache_dir, keep=MAX_CACHE_ENTRIES):
+    entries = [os.path.join(cache_dir, name) for name in os.listdir(cache_dir)]
+    entries.sort(key=_mtime, reverse=True)
+    for stale in entries[keep:]:
+        try:
+            os.remove(stale)
+        except OSError:
+            pass
@@ -0,0 +1,115 @@
+import argparse
+import csv
+import json
+from datetime import date
+
+COLUMNS = ["article_number", "description", "department", "category", "checkin_date", "inventory"]
+
+EXPORT_QUERY = """
+SELECT P.article_number, P.description, P.department, P.category, C.checkin_date, C.inventory
+FROM inventory_checkin AS C
+JOIN Products AS P ON P.id = C.product_id
+WHERE C.checkin_date BETWEEN %s AND %s
+"""
+
+
+class CsvSink:
+    def __init__(self, out_path):
+        self.file = open(out_path, "w", newline="")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(COLUMNS)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetSink:
+    """Writes each batch as its own row group, so memory stays at one batch."""
+
+    def __init__(self, out_path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self.pa = pa
+        self.schema = pa.schema([
+            ("article_number", pa.string()),
+            ("description", pa.string()),
+            ("department", pa.string()),
+            ("category", pa.string()),
+            ("checkin_date", pa.date32()),
+            ("inventory", pa.float32()),
+        ])
+        self.writer = pq.ParquetWriter(out_path, self.schema)
+
+    def write(self, rows):
+        columns = list(zip(*rows))
+        self.writer.write_table(self.pa.Table.from_arrays(
+            [self.pa.array(col, type=field.type) for col, field in zip(columns, self.schema)],
+            schema=self.schema
+        ))
+
+    def close(self):
+        self.writer.close()
+
+
+def export_history(db, out_path, start_date, end_date, department=None, category=None,
+                   batch_size=20000, progress=None):
+    """
+    Streams every check-in between start_date and end_date (inclusive),
+    optionally limited to one department and/or category prefix, into
+    out_path (.parquet for Parquet, anything else for CSV).
+
+    Rows come through a named server-side cursor `batch_size` at a time, so
+    client memory is bounded by one batch no matter how long the range is.
+    progress(rows_written) is called after each batch. Returns the row count.
+    """
+    query = EXPORT_QUERY
+    params = [start_date, end_date]
+    if department:
+        query += " AND P.department = %s"
+        params.append(department)
+    if category:
+        query += " AND P.category LIKE %s"
+        params.append(category.replace("%", r"\%").replace("_", r"\_") + "%")
+
+    sink = ParquetSink(out_path) if out_path.endswith(".parquet") else CsvSink(out_path)
+    written = 0
+    try:
+        with db.session() as (_, conn):
+            with conn.cursor(name="history_export") as stream:
+                stream.itersize = batch_size
+                stream.execute(query, params)
+                while True:
+                    rows = stream.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    sink.write(rows)
+                    written += len(rows)
+                    if progress is not None:
+                        progress(written)
+    finally:
+        sink.close()
+    return written
+
+
+if __name__ == "__main__":
+    from db_pool import ConnectionManager
+
+    parser = argparse.ArgumentParser(description="Export check-in history for a department/category and date range.")
+    parser.add_argument("out_path", help="output file; .parquet writes Parquet, anything else CSV")
+    parser.add_argument("--start", type=date.fromisoformat, required=True)
+    parser.add_argument("--end", type=date.fromisoformat, required=True)
+    parser.add_argument("--department")
+    parser.add_argument("--category", help="category prefix")
+    parser.add_argument("--batch-size", type=int, default=20000)
+    args = parser.parse_args()
+
+    db = ConnectionManager(json.load(open('config.json')))
+    count = export_history(
+        db, args.out_path, args.start, args.end, args.department, args.category, args.batch_size,
+        progress=lambda n: print(f"\r{n} rows", end="", flush=True)
+    )
+    print(f"\rExported {count} rows to {args.out_path}")
+    db.close_all()
@@ -0,0 +1,139 @@
+import argparse
+import io
+import json
+import time
+from collections import namedtuple
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+# Per-article arrays, all aligned with `articles`
+Forecast = namedtuple("Forecast", ["articles", "departments", "current", "velocity", "days_to_zero"])
+
+# Every check-in of every non-DNO product in the window, as (article, department, day offset, inventory)
+WINDOW_QUERY = """
+SELECT P.article_number, P.department, C.checkin_date - %(start)s, C.inventory
+FROM inventory_checkin AS C
+JOIN Products AS P ON P.id = C.product_id
+WHERE C.checkin_date BETWEEN %(start)s AND %(end)s
+  AND C.inventory IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM dno AS D WHERE D.article = P.article_number AND D.active)
+"""
+
+
+def load_matrix(cur, start, end):
+    """
+    Loads the window into a dense (articles x days) float32 matrix with NaN
+    for days without a check-in. The rows come over COPY as CSV and are
+    parsed by pandas, which is far quicker than fetchall() at this size.
+
+    Returns (articles, departments, matrix).
+    """
+    buffer = io.StringIO()
+    query = cur.mogrify(WINDOW_QUERY, {"start": start, "end": end}).decode()
+    cur.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv)", buffer)
+    buffer.seek(0)
+    df = pd.read_csv(
+        buffer, header=None, names=["article", "department", "day", "inventory"],
+        dtype={"article": str, "department": str, "day": np.int32, "inventory": np.float32}
+    )
+    return to_matrix(df, (end - start).days + 1)
+
+
+def to_matrix(df, days):
+    """
+    Pivots (article, department, day, inventory) rows into the matrix.
+    Rows are numbered with pd.factorize (hash-based, first-appearance order),
+    not np.unique, which would sort millions of Python strings.
+    """
+    rows, articles = pd.factorize(df["article"], sort=False)
+    # Codes are numbered in order of first appearance, so this keeps one row per code, in code order
+    first = pd.Series(rows).drop_duplicates().index.to_numpy()
+    articles = np.asarray(articles, dtype=object)
+    matrix = np.full((len(articles), days), np.nan, dtype=np.float32)
+    matrix[rows, df["day"].to_numpy()] = df["inventory"].to_numpy()
+    return articles, df["department"].to_numpy()[first], matrix
+
+
+def forecast(articles, departments, matrix, half_life=14.0):
+    """
+    Depletion velocity and days-to-zero for every row at once.
+
+    Velocity is the recency-weighted mean daily drop, over the day pairs
+    where both days were counted and stock did not go up (a rise is a
+    delivery, which hides that day's sales). Current stock is the last
+    count, projected forward to the end of the window at that velocity.
+    Depleting rows projected to have run out already get days_to_zero = 0
+    (the most urgent of all); only rows not depleting get inf.
+    """
+    n, days = matrix.shape
+    diffs = np.diff(matrix, axis=1)                   # NaN where either day is missing
+    usable = diffs <= 0                               # False for NaN and for deliveries
+    weights = 0.5 ** ((days - 2 - np.arange(days - 1, dtype=np.float32)) / half_life)
+    weighted = np.where(usable, -diffs, 0) * weights
+    total_weight = (usable * weights).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        velocity = np.where(total_weight > 0, weighted.sum(axis=1) / total_weight, 0).astype(np.float32)
+
+    # Last counted value per row and how many days old it is
+    counted = ~np.isnan(matrix)
+    age = np.argmax(counted[:, ::-1], axis=1)
+    last = matrix[np.arange(n), days - 1 - age]
+    current = np.maximum(last - velocity * age, 0)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        days_to_zero = np.where(velocity > 0, current / velocity, np.inf)
+    return Forecast(articles, departments, current, velocity, days_to_zero.astype(np.float32))
+
+
+def run_forecast(cur, weeks=13, half_life=14.0, end=None):
+    end = end or date.today()
+    start = end - timedelta(weeks=weeks) + timedelta(days=1)
+    return forecast(*load_matrix(cur, start, end), half_life=half_life)
+
+
+def soon_zeros(result, within_days):
+    """[(article, department, days_to_zero), ...] hitting zero within `within_days`, soonest first."""
+    hits = np.flatnonzero(result.days_to_zero <= within_days)
+    hits = hits[np.argsort(result.days_to_zero[hits], kind="stable")]
+    return [(result.articles[i], result.departments[i], float(result.days_to_zero[i])) for i in hits]
+
+
+def synthetic_matrix(products=50000, days=90, seed=0):
+    """Random depleting stock with weekly deliveries and ~5% missed counts."""
+    rng = np.random.default_rng(seed)
+    sales = rng.gamma(1.5, 1.0, size=(products, days)).astype(np.float32)
+    deliveries = np.zeros((products, days), dtype=np.float32)
+    deliveries[:, rng.integers(0, 7)::7] = rng.uniform(0, 15, size=(products, 1))
+    matrix = np.maximum(rng.uniform(5, 40, size=(products, 1)) + np.cumsum(deliveries - sales, axis=1), 0)
+    matrix[rng.random((products, days)) < 0.05] = np.nan
+    articles = np.arange(products).astype(str)
+    return articles, np.full(products, "Grocery", dtype=object), matrix.astype(np.float32)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Forecast which articles will be zero soon.")
+    parser.add_argument("--weeks", type=int, default=13)
+    parser.add_argument("--within", type=float, default=7, help="report articles hitting zero within this many days")
+    parser.add_argument("--half-life", type=float, default=14.0)
+    parser.add_argument("--synthetic", type=int, metavar="PRODUCTS",
+                        help="time the math on random data instead of querying the server")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        data = synthetic_matrix(args.synthetic, args.weeks * 7)
+        started = time.perf_counter()
+        result = forecast(*data, half_life=args.half_life)
+        elapsed = time.perf_counter() - started
+        print(f"{args.synthetic} x {args.weeks * 7}: {elapsed:.3f}s, "
+              f"{len(soon_zeros(result, args.within))} within {args.within:g} days")
+    else:
+        from db_pool import ConnectionManager
+
+        db = ConnectionManager(json.load(open('config.json')))
+        with db.session() as (cur, conn):
+            result = run_forecast(cur, args.weeks, args.half_life)
+        db.close_all()
+        for article, department, eta in soon_zeros(result, args.within):
+            print(f"{article}\t{department}\t{eta:.1f}")
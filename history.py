@@ -0,0 +1,148 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import pandas as pd
+import psycopg2
+
+from db_pool import ServerUnavailable
+
+# One article's history: dates as datetime64[D], values as float32
+History = namedtuple("History", ["article", "description", "dates", "values"])
+
+HISTORY_QUERY = """
+SELECT P.article_number, P.description, C.checkin_date, C.inventory
+FROM Products AS P
+LEFT JOIN inventory_checkin AS C
+       ON C.product_id = P.id
+      AND C.checkin_date BETWEEN %s AND %s
+      AND C.inventory IS NOT NULL
+WHERE P.article_number = ANY(%s)
+ORDER BY P.article_number, C.checkin_date
+"""
+
+
+def rows_to_histories(rows):
+    """
+    Turns (article, description, date, inventory) rows, sorted by article
+    then date, into {article: History} without a per-point Python loop.
+    """
+    if not rows:
+        return {}
+    return frame_to_histories(pd.DataFrame(rows, columns=["article", "description", "date", "inventory"]))
+
+
+def frame_to_histories(df):
+    """rows_to_histories for a frame with those four columns, sorted the same way."""
+    if df.empty:
+        return {}
+    articles = df["article"].to_numpy()
+    dates = pd.to_datetime(df["date"]).to_numpy(dtype="datetime64[D]")
+    values = df["inventory"].to_numpy(dtype="float32")
+    present = ~np.isnat(dates)  # LEFT JOIN rows for articles with no check-ins
+
+    # Rows are grouped by article already; find where each group starts
+    starts = np.flatnonzero(np.r_[True, articles[1:] != articles[:-1]])
+    ends = np.r_[starts[1:], len(articles)]
+
+    histories = {}
+    descriptions = df["description"].to_numpy()
+    for start, end in zip(starts, ends):
+        keep = present[start:end]
+        histories[articles[start]] = History(
+            articles[start],
+            descriptions[start],
+            dates[start:end][keep],
+            values[start:end][keep],
+        )
+    return histories
+
+
+class HistoryService:
+    """
+    Product history lookups for one or many articles in a single query.
+
+    Results are kept in a small LRU cache. Entries expire after `ttl`
+    seconds, and all of them are dropped by invalidate(), which the app
+    calls whenever an ingest finishes, so the cache never outlives new data.
+    Each fetch's latency and cache hits go to `metrics` when given.
+
+    With an `archive` (SnapshotArchive), a server that is unreachable or
+    too slow (statement timeout) is answered from the local snapshots
+    instead; those answers are not cached, so the server's copy is used
+    again as soon as it responds.
+    """
+
+    def __init__(self, db, max_entries=256, ttl=900, timeout_ms=None, metrics=None, archive=None):
+        self.db = db
+        self.metrics = metrics
+        self.archive = archive
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.timeout_ms = timeout_ms
+        self._cache = OrderedDict()  # (article, start, end) -> (stored at, generation, History)
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._cache.clear()
+
+    def _get_cached(self, key):
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        stored_at, generation, history = entry
+        if generation != self._generation or time.time() - stored_at > self.ttl:
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return history
+
+    def fetch(self, articles, start_date, end_date):
+        """
+        Returns {article: History} for the given articles over
+        start_date..end_date (inclusive). Unknown articles are left out.
+        Blocking -- call from a worker thread.
+        """
+        started = time.perf_counter()
+        articles = [str(a).strip() for a in articles if str(a).strip()]
+        found, missing = {}, []
+        with self._lock:
+            generation = self._generation
+            for article in articles:
+                history = self._get_cached((article, start_date, end_date))
+                if history is None:
+                    missing.append(article)
+                else:
+                    found[article] = history
+
+        source = "cache"
+        if missing:
+            source = "server"
+            try:
+                with self.db.session(timeout_ms=self.timeout_ms) as (cur, conn):
+                    cur.execute(HISTORY_QUERY, (start_date, end_date, missing))
+                    fetched = rows_to_histories(cur.fetchall())
+            except (ServerUnavailable, psycopg2.OperationalError):
+                fetched = self.archive.histories(missing, start_date, end_date) if self.archive else {}
+                if not fetched:
+                    raise
+                source = "snapshot"
+
+            now = time.time()
+            with self._lock:
+                if source == "server" and generation == self._generation:  # no ingest finished meanwhile
+                    for article, history in fetched.items():
+                        self._cache[(article, start_date, end_date)] = (now, generation, history)
+                    while len(self._cache) > self.max_entries:
+                        self._cache.popitem(last=False)
+            found.update(fetched)
+
+        if self.metrics is not None:
+            self.metrics.record("history_query", time.perf_counter() - started, ok=True,
+                                articles=len(articles), cache_hits=len(articles) - len(missing),
+                                days=(end_date - start_date).days + 1, source=source)
+        return {a: found[a] for a in articles if a in found}
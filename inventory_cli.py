@@ -0,0 +1,170 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import datetime
+
+from db_pool import ConnectionManager
+from dno_cache import DNOCache, cache_path_for
+from inventory_core import article_is_text, dno_articles, ingest, low_articles, parse_pool, parse_uploads, zero_articles
+from inventory_store import InventoryStore
+from metrics import Metrics
+from rules import FilterRules
+from sent_log import SentLog
+from snapshots import SnapshotArchive
+
+DNO_MAX_AGE = 300  # seconds, same as the app
+
+
+class HeadlessRunner:
+    """
+    The app's Excel -> zeros/lows -> Postgres flow without Tk, for cron and
+    servers. Every processed batch yields one JSON-serialisable dict.
+    """
+
+    def __init__(self, config_path="config.json", send=True, delta=True):
+        self.config = json.load(open(config_path))
+        self.rules = FilterRules.from_config(self.config)
+        self.db = ConnectionManager(self.config)
+        self.dno_cache = DNOCache(cache_path_for(config_path))
+        self.sent_log = SentLog()
+        self.metrics = Metrics.from_config(self.config)
+        self.archive = SnapshotArchive.from_config(self.config, metrics=self.metrics)
+        self.send = send
+        self.delta = delta
+
+    def process(self, file_paths):
+        """
+        Loads the workbooks together (parsed in parallel), archives them to
+        the local snapshots, finds zeros/lows and (optionally) ships them.
+        Any unreadable workbook fails the batch.
+        """
+        pool = parse_pool(len(file_paths))
+        try:
+            parsed, failed = parse_uploads(file_paths, self.rules, pool, metrics=self.metrics)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        if failed:
+            raise ValueError("; ".join(f"{os.path.basename(p)}: {e}" for p, e in failed.items()))
+
+        store = InventoryStore()
+        lit = set()
+        snapshot_error = []
+        for file_path, df, file_lit in parsed:
+            store.upsert(df, file_path)
+            try:
+                self.archive.append(df)
+            except Exception as e:  # the archive is a convenience; never fail a batch over it
+                self.metrics.record("snapshot_write", ok=False, file=os.path.basename(file_path), error=str(e))
+                snapshot_error.append(f"{os.path.basename(file_path)}: {e}")
+            lit |= file_lit
+        df = store.frame
+
+        dno_error = []
+        dno = dno_articles(self.db, self.dno_cache, DNO_MAX_AGE, on_sync_error=lambda e: dno_error.append(str(e)),
+                           metrics=self.metrics, as_text=article_is_text(df))
+        result = {
+            "files": [os.path.basename(p) for p in file_paths],
+            "processed_at": datetime.now().isoformat(timespec="seconds"),
+            "rows": len(df),
+            "departments": sorted(lit),
+            "zeros": sorted(str(a) for a in zero_articles(df, dno)),
+            "lows": sorted(str(a) for a in low_articles(df, self.rules)),
+        }
+        if dno_error:
+            result["dno_sync_error"] = dno_error[0]
+        if snapshot_error:
+            result["snapshot_error"] = "; ".join(snapshot_error)
+        if self.send:
+            new_products, sent, skipped = ingest(self.db, df, self.sent_log, self.rules, delta=self.delta,
+                                                  metrics=self.metrics)
+            result.update(new_products=len(new_products), sent=sent, skipped=skipped)
+        return result
+
+    def close(self):
+        self.dno_cache.close()
+        self.sent_log.close()
+        self.db.close_all()
+        self.metrics.close()
+
+
+# ----------------- Watch Folder -----------------
+def pending_workbooks(folder):
+    """*.xlsx files directly in folder, skipping Excel's ~$ lock files."""
+    return sorted(
+        os.path.join(folder, name) for name in os.listdir(folder)
+        if name.lower().endswith(".xlsx") and not name.startswith("~$")
+    )
+
+
+def move_into(file_path, subfolder):
+    target_dir = os.path.join(os.path.dirname(file_path), subfolder)
+    os.makedirs(target_dir, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    shutil.move(file_path, os.path.join(target_dir, f"{stamp}-{os.path.basename(file_path)}"))
+
+
+def watch(runner, folder, interval=10.0, settle=5.0, emit=print):
+    """
+    Polls `folder` for department exports. A file is processed once its
+    size and mtime have not changed for `settle` seconds (so half-copied
+    files are left alone), then moved to processed/ or failed/.
+    """
+    seen = {}  # path -> ((size, mtime), first seen unchanged at)
+    while True:
+        now = time.time()
+        for file_path in pending_workbooks(folder):
+            try:
+                stat = os.stat(file_path)
+            except FileNotFoundError:
+                continue
+            signature = (stat.st_size, stat.st_mtime)
+            previous = seen.get(file_path)
+            if previous is None or previous[0] != signature:
+                seen[file_path] = (signature, now)
+                continue
+            if now - previous[1] < settle:
+                continue
+
+            del seen[file_path]
+            try:
+                emit(json.dumps({"status": "ok", **runner.process([file_path])}))
+                move_into(file_path, "processed")
+            except Exception as e:
+                emit(json.dumps({"status": "error", "files": [os.path.basename(file_path)], "error": str(e)}))
+                move_into(file_path, "failed")
+        time.sleep(interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless inventory ingest; prints JSON results to stdout.")
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--no-send", action="store_true", help="find zeros/lows only, don't write to Postgres")
+    parser.add_argument("--full", action="store_true", help="send every row, not only rows changed today")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("run", help="process the given workbooks once, as one upload")
+    run.add_argument("files", nargs="+")
+    watch_cmd = sub.add_parser("watch", help="process workbooks as they land in a folder (one JSON line each)")
+    watch_cmd.add_argument("folder")
+    watch_cmd.add_argument("--interval", type=float, default=10.0, help="seconds between folder scans")
+    watch_cmd.add_argument("--settle", type=float, default=5.0, help="seconds a file must stay unchanged")
+    args = parser.parse_args()
+
+    runner = HeadlessRunner(args.config, send=not args.no_send, delta=not args.full)
+    try:
+        if args.command == "run":
+            try:
+                print(json.dumps({"status": "ok", **runner.process(args.files)}))
+            except Exception as e:
+                print(json.dumps({"status": "error", "files": args.files, "error": str(e)}))
+                sys.exit(1)
+        else:
+            watch(runner, args.folder, args.interval, args.settle,
+                  emit=lambda line: print(line, flush=True))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        runner.close()
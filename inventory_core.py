@@ -0,0 +1,273 @@
+import io
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+
+import pandas as pd
+import psycopg2
+
+from db_pool import ServerUnavailable
+from excel_reader import DEFAULT_CACHE_DIR, read_inventory
+from rollups import refresh_staged
+from schema import ensure_checkin_table, ensure_partitions
+from sent_log import changed_mask, previous_values
+
+# What one ingest did: descriptions of newly discovered products, rows sent, unchanged rows skipped
+IngestResult = namedtuple("IngestResult", ["new_products", "sent", "skipped"])
+
+
+# ----------------- Parsing & Filtering -----------------
+def load_upload(file_path, rules, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Parses one department workbook and drops banned categories.
+    Returns (filtered frame, light groups present in the file).
+    """
+    df = read_inventory(file_path, cache_dir)
+    lit = rules.light_groups(df["Department"])
+    return rules.filter_banned(df), lit
+
+
+def _load_timed(file_path, rules, cache_dir):
+    """load_upload plus its stage timings, measured where the work runs (possibly a pool process)."""
+    started = time.perf_counter()
+    df = read_inventory(file_path, cache_dir)
+    read_done = time.perf_counter()
+    lit = rules.light_groups(df["Department"])
+    filtered = rules.filter_banned(df)
+    timings = {"excel_read": read_done - started, "filter": time.perf_counter() - read_done, "rows": len(df)}
+    return filtered, lit, timings
+
+
+def parse_pool(file_count):
+    """A process pool sized for file_count workbooks, or None when one process will do."""
+    workers = min(file_count, os.cpu_count() or 1)
+    return ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+
+
+def parse_uploads(file_paths, rules, pool=None, on_parsed=None, cache_dir=DEFAULT_CACHE_DIR, metrics=None):
+    """
+    Runs load_upload for every workbook, in parallel on `pool` (a
+    ProcessPoolExecutor) when given. xlsx parsing is CPU-bound, so processes
+    rather than threads are what brings the total down to the slowest file.
+
+    on_parsed(file_path, lit) is called in completion order, from the
+    calling thread. Returns ([(file_path, df, lit), ...] in input order,
+    {file_path: error} for the workbooks that failed to parse).
+    Per-file excel_read/filter timings go to `metrics` when given.
+    """
+    results, failed = {}, {}
+    if pool is None:
+        outcomes = ((path, lambda path=path: _load_timed(path, rules, cache_dir)) for path in file_paths)
+    else:
+        futures = {pool.submit(_load_timed, path, rules, cache_dir): path for path in file_paths}
+        outcomes = ((futures[f], f.result) for f in as_completed(futures))
+
+    for file_path, get_result in outcomes:
+        try:
+            df, lit, timings = get_result()
+        except Exception as e:
+            failed[file_path] = e
+            if metrics is not None:
+                metrics.record("excel_read", ok=False, file=os.path.basename(file_path), error=str(e))
+            continue
+        results[file_path] = (df, lit)
+        if metrics is not None:
+            name = os.path.basename(file_path)
+            metrics.record("excel_read", timings["excel_read"], ok=True, file=name, rows=timings["rows"],
+                           parallel=pool is not None)
+            metrics.record("filter", timings["filter"], ok=True, file=name, rows=len(df))
+        if on_parsed is not None:
+            on_parsed(file_path, lit)
+
+    return [(path, *results[path]) for path in file_paths if path in results], failed
+
+
+def zero_articles(df, dno_articles):
+    """
+    Unique articles with inventory <= 0 that are not active DNOs.
+    dno_articles must match df's Article type: the int64 array for int64
+    articles, the str array (see dno_articles(as_text=True)) for text ones.
+    """
+    articles = df["Article"][df["Inventory"].to_numpy() <= 0]
+    return articles[~articles.isin(dno_articles)].dropna().unique()
+
+
+def low_articles(df, rules):
+    """Unique articles with 0 < inventory <= their low threshold."""
+    inventory = df["Inventory"].to_numpy()
+    return df["Article"][(inventory > 0) & (inventory <= rules.low_thresholds(df))].dropna().unique()
+
+
+def article_is_text(df):
+    """True when the frame's articles are str (a store with alphanumeric codes), not int64."""
+    return "Article" in df.columns and not pd.api.types.is_integer_dtype(df["Article"])
+
+
+def dno_articles(db, dno_cache, max_age, timeout_ms=None, on_sync_error=None, metrics=None, as_text=False):
+    """
+    Active DNO articles as a sorted int64 array, from the local cache, or
+    with as_text=True as a str array that keeps alphanumeric codes too.
+    The cache is delta-synced first if it is older than max_age seconds;
+    if the server can't be reached, on_sync_error(error) is called and the
+    last synced copy is used.
+    """
+    started = time.perf_counter()
+    synced, changed = False, 0
+    if dno_cache.is_stale(max_age):
+        try:
+            with db.session(timeout_ms=timeout_ms) as (cur, conn):
+                changed = dno_cache.sync(cur)
+            synced = True
+        except (ServerUnavailable, psycopg2.Error) as e:
+            if metrics is not None:
+                metrics.record("dno_fetch", time.perf_counter() - started, ok=False, error=str(e))
+            if on_sync_error is None:
+                raise
+            on_sync_error(e)
+    articles = dno_cache.as_str_array() if as_text else dno_cache.as_int_array()
+    if metrics is not None:
+        metrics.record("dno_fetch", time.perf_counter() - started, ok=True, synced=synced,
+                       changed=changed, articles=len(articles))
+    return articles
+
+
+# ----------------- Ingest -----------------
+def stage_frame(df):
+    """The inventory in staging-table column order, one row per article."""
+    df = df[df["Article"].notna()]
+    return pd.DataFrame({
+        "article_number": df["Article"].astype(str),
+        "description": df.get("Article Description"),
+        "department": df.get("Department"),
+        "category": df.get("Merchandise Category"),
+        "inventory": df.get("Inventory"),
+    })
+
+
+def fetch_sent_today(cur, today):
+    """The stored values for every article on `today`, in one query."""
+    cur.execute("""
+        SELECT P.article_number, C.inventory
+        FROM inventory_checkin AS C
+        JOIN Products AS P ON P.id = C.product_id
+        WHERE C.checkin_date = %s
+    """, (today,))
+    return previous_values(cur.fetchall())
+
+
+def bulk_ingest(cur, staged, checkin_date, progress=None):
+    """
+    Streams the staged rows into a temp staging table with COPY, then
+    resolves new products and upserts today's check-ins with set-based
+    statements. Everything runs inside the caller's transaction, so the
+    cost is a handful of round trips and one commit regardless of row count.
+
+    Returns the descriptions of newly discovered products.
+    """
+    progress = progress or (lambda done, total: None)
+
+    # 1) Stream the frame into the staging table (empty CSV fields -> NULL)
+    buffer = io.StringIO()
+    staged.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+
+    cur.execute("""
+        CREATE TEMP TABLE staging_inventory (
+            article_number text,
+            description text,
+            department text,
+            category text,
+            inventory real
+        ) ON COMMIT DROP
+    """)
+    cur.copy_expert("COPY staging_inventory FROM STDIN WITH (FORMAT csv)", buffer)
+    progress(1, 3)
+
+    # 2) Insert every article we have never seen before in one statement
+    cur.execute("""
+        INSERT INTO Products (article_number, description, department, category)
+        SELECT DISTINCT ON (s.article_number)
+               s.article_number, s.description, s.department, s.category
+        FROM staging_inventory AS s
+        WHERE NOT EXISTS (
+            SELECT 1 FROM Products AS P WHERE P.article_number = s.article_number
+        )
+        ORDER BY s.article_number
+        ON CONFLICT (article_number) DO NOTHING
+        RETURNING description
+    """)
+    new_products = [r[0] for r in cur.fetchall()]
+    progress(2, 3)
+
+    # 3) Upsert today's check-in for every staged article
+    cur.execute("""
+        INSERT INTO inventory_checkin (product_id, checkin_date, inventory)
+        SELECT DISTINCT ON (P.id) P.id, %s, s.inventory
+        FROM staging_inventory AS s
+        JOIN Products AS P ON P.article_number = s.article_number
+        ORDER BY P.id
+        ON CONFLICT (product_id, checkin_date)
+        DO UPDATE SET inventory = EXCLUDED.inventory
+    """, (checkin_date,))
+    progress(3, 3)
+
+    return new_products
+
+
+def ingest(db, df, sent_log, rules, delta=True, progress=None, metrics=None, checkin_date=None):
+    """
+    Ships an inventory frame to Postgres as the check-in for checkin_date
+    (today by default) and refreshes the rollups for the groups it touched,
+    all in one transaction.
+
+    With delta=True only rows whose inventory differs from what was last
+    sent that day are shipped; the last-sent values come from sent_log, or
+    from one bulk query if this machine hasn't sent that day. Blocking.
+    """
+    return ingest_staged(db, stage_frame(df), sent_log, rules, delta, progress, metrics, checkin_date)
+
+
+def ingest_staged(db, staged, sent_log, rules, delta=True, progress=None, metrics=None, checkin_date=None):
+    """ingest() for a frame already in stage_frame() shape (e.g. replayed from the journal)."""
+    started = time.perf_counter()
+    try:
+        result = _ingest(db, staged, sent_log, rules, delta, progress, checkin_date or date.today())
+    except Exception as e:
+        if metrics is not None:
+            metrics.record("ingest", time.perf_counter() - started, ok=False, error=str(e))
+        raise
+
+    if metrics is not None:
+        seconds = time.perf_counter() - started
+        metrics.record("ingest", seconds, ok=True, rows=result.sent, skipped=result.skipped,
+                       new_products=len(result.new_products), rows_per_sec=round(result.sent / seconds, 1))
+    return result
+
+
+def _ingest(db, staged, sent_log, rules, delta, progress, checkin_date):
+    day = checkin_date.isoformat()
+    skipped = 0
+
+    with db.session() as (cur, conn):
+        ensure_checkin_table(cur)
+        ensure_partitions(cur, checkin_date, checkin_date)
+
+        if delta:
+            previous = sent_log.load(day)
+            if previous.empty:
+                previous = fetch_sent_today(cur, checkin_date)
+            changed = changed_mask(staged["article_number"], staged["inventory"], previous)
+            skipped = int((~changed).sum())
+            staged = staged[changed]
+
+        new_products = []
+        if not staged.empty:
+            new_products = bulk_ingest(cur, staged, checkin_date, progress)
+            # Last step, same transaction: rollups for the groups this run touched
+            refresh_staged(cur, rules, checkin_date)
+
+    # Only remember what the server actually committed
+    sent_log.record(day, staged["article_number"].tolist(), staged["inventory"].tolist())
+    return IngestResult(new_products, len(staged), skipped)
@@ -0,0 +1,166 @@
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from excel_reader import CATEGORY_COLUMNS, concat_inventory
+
+
+class InventoryStore:
+    """
+    In-memory inventory assembled from department uploads.
+
+    Rows are kept per department, so an upload only splits and stores its
+    own rows (O(new rows)) and re-uploading a corrected department replaces
+    just that department. The merged, article-unique frame is built lazily
+    the first time it is read after a change, instead of on every upload.
+    When the same article shows up under two departments, the most recently
+    uploaded one wins.
+
+    Once built, the merged frame is kept up to date: an upload masks out
+    the rows it supersedes and appends its own, so later reads never
+    re-concatenate and de-duplicate every department again.
+    """
+
+    def __init__(self):
+        self._departments = {}  # department -> rows of that department
+        self._files = {}  # department -> (file name, row count, loaded at)
+        self._frame = None
+
+    def upsert(self, df, file_path=None):
+        """
+        Adds one upload. Returns the departments that replaced earlier rows.
+        """
+        replaced = []
+        for department, rows in df.groupby("Department", dropna=False, sort=False, observed=True):
+            old = self._departments.pop(department, None)  # re-insert at the end: newest wins
+            if old is not None:
+                replaced.append(department)
+            self._departments[department] = rows
+            self._merge(department, old, rows)
+            self._files[department] = (
+                os.path.basename(file_path) if file_path else None,
+                len(rows),
+                datetime.now(),
+            )
+        return replaced
+
+    def remove_department(self, department):
+        old = self._departments.pop(department, None)
+        self._files.pop(department, None)
+        if old is not None:
+            self._merge(department, old, None)
+
+    def loaded_files(self):
+        """{department: (file name, rows, loaded at)} for every department loaded."""
+        return dict(self._files)
+
+    @property
+    def frame(self):
+        if self._frame is None:
+            if not self._departments:
+                self._frame = pd.DataFrame()
+            else:
+                combined = concat_inventory(self._departments.values())
+                self._frame = combined.drop_duplicates(subset=["Article"], keep="last", ignore_index=True)
+        return self._frame
+
+    # ----------------- Incremental Merge -----------------
+    def _merge(self, department, old, rows):
+        """
+        Brings the merged frame up to date after `department` changed from
+        `old` rows to `rows` (None when removed), without re-encoding or
+        de-duplicating the other departments: their rows are only masked and
+        copied. When some article lives in more than one department, the
+        articles the old upload supplied and the new one lacks are looked up
+        again, as the next-newest upload now wins them.
+        """
+        frame = self._frame
+        if frame is None:
+            return  # not built yet; the first read builds it
+        if not self._departments:
+            self._frame = pd.DataFrame()
+            return
+        if frame.empty or (rows is not None and _text_articles(rows) != _text_articles(frame)):
+            self._frame = None  # int/str article switch: rebuild once on the next read
+            return
+
+        stored = sum(len(r) for r in self._departments.values())
+        stored += (len(old) if old is not None else 0) - (len(rows) if rows is not None else 0)
+        incoming = rows.drop_duplicates(subset=["Article"], keep="last") if rows is not None else None
+        articles = frame["Article"]
+        supplied = np.zeros(len(frame), dtype=bool)
+        if old is not None:
+            supplied = _is_department(frame["Department"], department)
+        shadowed = np.zeros(len(frame), dtype=bool)
+        if incoming is not None:
+            shadowed = articles.isin(incoming["Article"]).to_numpy()
+
+        parts = [frame[~(supplied | shadowed)]]
+        if stored > len(frame):  # some articles were hidden behind a newer department
+            orphans = articles.to_numpy()[supplied & ~shadowed]
+            if len(orphans):
+                parts.append(self._fallback(orphans))
+        if incoming is not None:
+            parts.append(incoming)
+        self._frame = _append(parts)
+
+    def _fallback(self, articles):
+        """The newest remaining row for each of `articles` among the loaded departments."""
+        found = []
+        wanted = pd.Index(articles)
+        for department in reversed(list(self._departments)):
+            if not len(wanted):
+                break
+            rows = self._departments[department]
+            hits = rows[rows["Article"].isin(wanted)].drop_duplicates(subset=["Article"], keep="last")
+            if not hits.empty:
+                found.append(hits)
+                wanted = wanted.difference(pd.Index(hits["Article"]))
+        return _append(found)
+
+    @property
+    def empty(self):
+        return not self._departments
+
+    def __len__(self):
+        return len(self.frame)
+
+
+def _text_articles(df):
+    return not pd.api.types.is_integer_dtype(df["Article"])
+
+
+def _is_department(values, department):
+    # Rows without a department are grouped under NaN, which never compares equal
+    return values.isna().to_numpy() if pd.isna(department) else (values == department).to_numpy()
+
+
+def _append(parts):
+    """
+    Concatenates canonical frames, widening the categories of the existing
+    rows instead of re-encoding the whole frame as concat_inventory does.
+    """
+    parts = [part for part in parts if part is not None and len(part)]
+    if not parts:
+        return pd.DataFrame()
+    for column in CATEGORY_COLUMNS:
+        categories = None
+        for part in parts:
+            own = part[column].cat.categories
+            if len(own):  # an all-blank column has empty float categories; don't let it turn str into object
+                categories = own if categories is None else categories.union(own, sort=False)
+        if categories is None:
+            continue
+        parts = [
+            part if _same_categories(part[column].cat.categories, categories)
+            else part.assign(**{column: part[column].cat.set_categories(categories)})
+            for part in parts
+        ]
+    return pd.concat(parts, ignore_index=True)
+
+
+def _same_categories(own, categories):
+    # Index.equals ignores dtype, but concat needs str and object categories to match too
+    return own.dtype == categories.dtype and own.equals(categories)
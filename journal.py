@@ -0,0 +1,317 @@
+import io
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import date, datetime, timezone
+
+import pandas as pd
+import psycopg2
+from psycopg2 import extras
+
+from db_pool import ServerUnavailable
+from dno_cache import ensure_server_schema
+from inventory_core import ingest_staged, stage_frame
+
+DEFAULT_JOURNAL_PATH = "journal.db"
+KEEP_DONE_DAYS = 7
+MAX_ATTEMPTS = 5  # a batch the server keeps rejecting (not just unreachable) is set aside after this
+
+STAGED_DTYPES = {"article_number": str, "description": str, "department": str, "category": str,
+                 "inventory": "float32"}
+
+# Last writer wins: an edit only lands if it is strictly newer than the server's
+# row. A replayed edit that already landed carries the same timestamp and must
+# be a no-op; otherwise dno_touch would see updated_at unchanged and stamp now(),
+# making the old edit outrank newer ones still queued elsewhere.
+DNO_UPSERT = """
+INSERT INTO dno (article, active, updated_at)
+VALUES %s
+ON CONFLICT (article) DO UPDATE
+SET active = EXCLUDED.active, updated_at = EXCLUDED.updated_at
+WHERE dno.updated_at < EXCLUDED.updated_at
+"""
+
+
+class Journal:
+    """
+    Local append-only journal of everything headed for the server.
+
+    Check-in batches (the staged frame, zlib-compressed CSV) and DNO edits
+    are committed here first, in SQLite's WAL mode, so they survive the
+    uplink dropping, the window closing or the machine crashing. Entries
+    are shipped in id order by JournalFlusher and only marked done once the
+    server has committed them. Replays are harmless: check-ins are upserts
+    and DNO edits carry their own timestamp.
+    """
+
+    def __init__(self, path=DEFAULT_JOURNAL_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS journal (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,           -- 'checkin' | 'dno'
+                day TEXT,                     -- check-in date (checkin entries)
+                meta TEXT NOT NULL,           -- JSON: row count / delta flag, or the DNO edit
+                payload BLOB,
+                created_at REAL NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',  -- 'pending' | 'done' | 'dead'
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                done_at REAL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS journal_status_idx ON journal (status, id)")
+        self.conn.commit()
+
+    # ----------------- Append -----------------
+    def append_checkin(self, df, checkin_date=None, delta=True):
+        """Journals an inventory frame as one check-in batch. Returns the entry id."""
+        staged = stage_frame(df)
+        buffer = io.StringIO()
+        staged.to_csv(buffer, index=False)
+        meta = {"rows": len(staged), "delta": delta}
+        return self._append("checkin", (checkin_date or date.today()).isoformat(), meta,
+                            zlib.compress(buffer.getvalue().encode()))
+
+    def append_dno(self, article, active):
+        """Journals one DNO add (active=True) or removal. Returns the entry id."""
+        meta = {"article": str(article), "active": bool(active),
+                "at": datetime.now(timezone.utc).isoformat()}
+        return self._append("dno", None, meta, None)
+
+    def _append(self, kind, day, meta, payload):
+        with self._lock, self.conn:
+            cur = self.conn.execute(
+                "INSERT INTO journal (kind, day, meta, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+                (kind, day, json.dumps(meta), payload, time.time())
+            )
+            return cur.lastrowid
+
+    # ----------------- Read & Acknowledge -----------------
+    def pending(self, limit=100):
+        """[(id, kind, day, meta, payload), ...] oldest first."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT id, kind, day, meta, payload FROM journal WHERE status = 'pending' ORDER BY id LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [(i, kind, day, json.loads(meta), payload) for i, kind, day, meta, payload in rows]
+
+    def mark_done(self, ids):
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "UPDATE journal SET status = 'done', done_at = ?, payload = NULL WHERE id = ?",
+                [(time.time(), i) for i in ids]
+            )
+
+    def mark_failed(self, ids, error, max_attempts=MAX_ATTEMPTS):
+        """Counts a rejected attempt; entries rejected max_attempts times are set aside as 'dead'."""
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "UPDATE journal SET attempts = attempts + 1, last_error = ?, "
+                "status = CASE WHEN attempts + 1 >= ? THEN 'dead' ELSE status END WHERE id = ?",
+                [(str(error), max_attempts, i) for i in ids]
+            )
+
+    def backlog(self):
+        """{"checkin": entries, "checkin_rows": rows, "dno": entries, "dead": entries, "oldest": age in s}."""
+        with self._lock:
+            rows = self.conn.execute("""
+                SELECT kind, status, count(*), sum(json_extract(meta, '$.rows')), min(created_at)
+                FROM journal WHERE status != 'done' GROUP BY kind, status
+            """).fetchall()
+        backlog = {"checkin": 0, "checkin_rows": 0, "dno": 0, "dead": 0, "oldest": None}
+        oldest = None
+        for kind, status, count, row_total, created in rows:
+            if status == "dead":
+                backlog["dead"] += count
+                continue
+            backlog[kind] += count
+            if kind == "checkin":
+                backlog["checkin_rows"] += row_total or 0
+            oldest = created if oldest is None else min(oldest, created)
+        if oldest is not None:
+            backlog["oldest"] = round(time.time() - oldest)
+        return backlog
+
+    def prune(self, keep_days=KEEP_DONE_DAYS):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM journal WHERE status = 'done' AND done_at < ?",
+                              (time.time() - keep_days * 86400,))
+
+    def close(self):
+        self.conn.close()
+
+
+def load_staged(payload):
+    return pd.read_csv(io.BytesIO(zlib.decompress(payload)), dtype=STAGED_DTYPES)
+
+
+def batches(entries):
+    """
+    Groups pending entries into as few server round trips as ordering allows:
+    consecutive DNO edits become one batch, consecutive check-ins for the
+    same day (and delta setting) are concatenated, later rows winning.
+    """
+    group, key = [], None
+    for entry in entries:
+        _, kind, day, meta, _ = entry
+        entry_key = (kind, day, meta.get("delta"))
+        if group and entry_key != key:
+            yield key[0], group
+            group = []
+        group.append(entry)
+        key = entry_key
+    if group:
+        yield key[0], group
+
+
+class JournalFlusher:
+    """
+    Background thread that ships the journal to Postgres.
+
+    It wakes every `interval` seconds, or at once on kick(). While the
+    server is unreachable it backs off (doubling up to max_interval) and
+    tries again; nothing is lost, since entries stay pending until the
+    server commits them. on_flushed(kind, results) and on_backlog(backlog)
+    are called from the flusher thread after each round.
+    """
+
+    def __init__(self, journal, db, sent_log, rules, metrics=None, interval=15, max_interval=300,
+                 on_flushed=None, on_backlog=None):
+        self.journal = journal
+        self.db = db
+        self.sent_log = sent_log
+        self.rules = rules
+        self.metrics = metrics
+        self.interval = interval
+        self.max_interval = max_interval
+        self.on_flushed = on_flushed
+        self.on_backlog = on_backlog
+        self._wake = threading.Event()
+        self._stop = threading.Event()  # end the loop (after a last drain, if asked)
+        self._halt = threading.Event()  # stop shipping, even mid-drain
+        self._drain = False
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="journal-flusher", daemon=True)
+        self._thread.start()
+
+    def kick(self):
+        self._wake.set()
+
+    def stop(self, timeout=10, drain=True):
+        """
+        Stops the flusher. With drain=True it first makes one last attempt
+        to ship the backlog, for at most `timeout` seconds; whatever is left
+        (or was in flight) stays pending and is sent next session.
+
+        Returns True once the thread has exited. If it is still busy (a slow
+        server), it stops touching the journal as soon as it can. In that case
+        the caller must leave the journal and the connection pool open for the
+        daemon thread rather than closing them underneath it.
+        """
+        self._drain = drain
+        if not drain:
+            self._halt.set()
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._halt.set()
+        return self._thread is None or not self._thread.is_alive()
+
+    def _loop(self):
+        delay = self.interval
+        while not self._stop.is_set():
+            delay = self._round(delay)
+            self._wake.wait(delay)
+            self._wake.clear()
+        if self._drain:
+            self._round(delay)
+
+    def _round(self, delay):
+        """One flush attempt; returns the delay before the next one."""
+        try:
+            self.flush()
+            delay = self.interval
+        except (ServerUnavailable, psycopg2.OperationalError):
+            delay = min(delay * 2, self.max_interval)
+        if self.on_backlog is not None and not self._halt.is_set():
+            self.on_backlog(self.journal.backlog())
+        return delay
+
+    def flush(self):
+        """
+        Ships pending entries in order. Raises if the server is unreachable.
+        A batch the server rejects is counted against its entries and the
+        round ends there, so later entries never overtake it; after
+        MAX_ATTEMPTS rounds it is set aside. Returns the number of entries shipped.
+
+        Once halted, nothing more is written to the journal: a batch that
+        reached the server meanwhile stays pending and its replay is a no-op.
+        """
+        shipped = 0
+        rejected = False
+        while not (rejected or self._halt.is_set()):
+            entries = self.journal.pending()
+            if not entries:
+                break
+            for kind, group in batches(entries):
+                if self._halt.is_set():
+                    break
+                ids = [entry[0] for entry in group]
+                started = time.perf_counter()
+                try:
+                    results = self._ship_dno(group) if kind == "dno" else self._ship_checkins(group)
+                except (ServerUnavailable, psycopg2.OperationalError):
+                    raise
+                except Exception as e:
+                    if self._halt.is_set():
+                        break
+                    self.journal.mark_failed(ids, e)
+                    if self.metrics is not None:
+                        self.metrics.record("journal_flush", time.perf_counter() - started, ok=False,
+                                            kind=kind, entries=len(ids), error=str(e))
+                    rejected = True
+                    break
+                if self._halt.is_set():
+                    break
+                self.journal.mark_done(ids)
+                shipped += len(ids)
+                if self.metrics is not None:
+                    self.metrics.record("journal_flush", time.perf_counter() - started, ok=True,
+                                        kind=kind, entries=len(ids))
+                if self.on_flushed is not None:
+                    self.on_flushed(kind, results)
+        if shipped and not self._halt.is_set():
+            self.journal.prune()
+        return shipped
+
+    def _ship_dno(self, group):
+        latest = {}
+        for _, _, _, meta, _ in group:
+            latest[meta["article"]] = meta  # journal order: the last edit per article wins
+        with self.db.session() as (cur, conn):
+            ensure_server_schema(cur)
+            extras.execute_values(
+                cur, DNO_UPSERT,
+                [(m["article"], m["active"], m["at"]) for m in latest.values()]
+            )
+        return list(latest.values())
+
+    def _ship_checkins(self, group):
+        day = date.fromisoformat(group[0][2])
+        delta = group[0][3].get("delta", True)
+        frames = [load_staged(payload) for _, _, _, _, payload in group]
+        staged = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        staged = staged.drop_duplicates(subset=["article_number"], keep="last")
+        return ingest_staged(self.db, staged, self.sent_log, self.rules, delta,
+                             metrics=self.metrics, checkin_date=day)
@@ -0,0 +1,127 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+DEFAULT_METRICS_PATH = "metrics.jsonl"
+
+
+class Metrics:
+    """
+    Structured per-stage timings for one session.
+
+    Every record is one JSON line in a size-rotated local file, tagged with
+    the store and a session id, so files from several stores can be
+    concatenated and grouped. If `prometheus_textfile` is set, running
+    totals per stage are also written there in the Prometheus text format
+    (for node_exporter's textfile collector) after each record.
+    """
+
+    def __init__(self, path=DEFAULT_METRICS_PATH, store=None, max_bytes=5 * 1024 * 1024, backups=5,
+                 prometheus_textfile=None):
+        self.store = store or socket.gethostname()
+        self.session = uuid.uuid4().hex[:12]
+        self.prometheus_textfile = prometheus_textfile
+        self._lock = threading.Lock()
+        self._totals = {}  # stage -> {"runs", "seconds", "last_seconds", numeric fields summed}
+
+        self._logger = logging.getLogger(f"metrics.{self.session}")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        self._handler = None
+        if path:
+            self._handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+            self._handler.setFormatter(logging.Formatter("%(message)s"))
+            self._logger.addHandler(self._handler)
+
+    @classmethod
+    def from_config(cls, config):
+        section = config.get("metrics", {})
+        return cls(
+            path=section.get("path", DEFAULT_METRICS_PATH),
+            store=section.get("store"),
+            max_bytes=section.get("max_bytes", 5 * 1024 * 1024),
+            backups=section.get("backups", 5),
+            prometheus_textfile=section.get("prometheus_textfile"),
+        )
+
+    # ----------------- Recording -----------------
+    def record(self, stage, seconds=None, **fields):
+        """Writes one record. Numeric fields are also summed per stage for the Prometheus export."""
+        entry = {
+            "ts": datetime.now().isoformat(timespec="milliseconds"),
+            "store": self.store,
+            "session": self.session,
+            "stage": stage,
+        }
+        if seconds is not None:
+            entry["seconds"] = round(seconds, 6)
+        entry.update(fields)
+
+        with self._lock:
+            totals = self._totals.setdefault(stage, {"runs": 0, "failures": 0, "seconds": 0.0})
+            totals["runs"] += 1
+            if fields.get("ok") is False:
+                totals["failures"] += 1
+            if seconds is not None:
+                totals["seconds"] += seconds
+                totals["last_seconds"] = seconds
+            for key, value in fields.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    totals[key] = totals.get(key, 0) + value
+            self._logger.info(json.dumps(entry, default=str))
+            if self.prometheus_textfile:
+                self._write_prometheus()
+
+    @contextmanager
+    def stage(self, name, **fields):
+        """
+        Times the block and records it. The yielded dict can be filled with
+        more fields (row counts etc.) before the block ends. A block that
+        raises is recorded with ok=False and the error.
+        """
+        extra = dict(fields)
+        started = time.perf_counter()
+        try:
+            yield extra
+        except Exception as e:
+            self.record(name, time.perf_counter() - started, ok=False, error=str(e), **extra)
+            raise
+        self.record(name, time.perf_counter() - started, ok=True, **extra)
+
+    # ----------------- Prometheus -----------------
+    def _write_prometheus(self):
+        lines = []
+        labels = f'store="{_escape(self.store)}"'
+        for stage, totals in sorted(self._totals.items()):
+            stage_labels = f'{labels},stage="{_escape(stage)}"'
+            lines.append(f"inventory_stage_runs_total{{{stage_labels}}} {totals['runs']}")
+            lines.append(f"inventory_stage_failures_total{{{stage_labels}}} {totals['failures']}")
+            lines.append(f"inventory_stage_seconds_total{{{stage_labels}}} {totals['seconds']:.6f}")
+            if "last_seconds" in totals:
+                lines.append(f"inventory_stage_last_seconds{{{stage_labels}}} {totals['last_seconds']:.6f}")
+            for key in ("rows", "articles"):
+                if key in totals:
+                    lines.append(f"inventory_stage_{key}_total{{{stage_labels}}} {totals[key]}")
+
+        # Written to a temp file and renamed, so the collector never reads half a file
+        tmp_path = self.prometheus_textfile + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.prometheus_textfile)
+
+    def close(self):
+        if self._handler is not None:
+            self._logger.removeHandler(self._handler)
+            self._handler.close()
+            self._handler = None
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,147 @@
+import argparse
+import json
+from datetime import date, timedelta
+
+from server_reports import threshold_params
+
+# Per-(department, category, day) aggregates, kept up to date by the ingest.
+#   - zeros leave out articles that were active DNOs when the row was refreshed
+#   - lows use the store's FilterRules thresholds, same as server_reports
+#   - NULL departments/categories are stored as '' so they can be keyed
+# The weekly view reads only the small rollup table, never the check-ins.
+ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkin_rollup (
+    department text NOT NULL,
+    category text NOT NULL,
+    checkin_date date NOT NULL,
+    articles integer NOT NULL,
+    zeros integer NOT NULL,
+    lows integer NOT NULL,
+    on_hand double precision NOT NULL,
+    refreshed_at timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (department, category, checkin_date)
+);
+
+CREATE INDEX IF NOT EXISTS checkin_rollup_date_idx ON checkin_rollup (checkin_date);
+
+CREATE OR REPLACE VIEW checkin_rollup_weekly AS
+SELECT department, category,
+       date_trunc('week', checkin_date)::date AS week_start,
+       count(*) AS days,
+       avg(zeros) AS avg_zeros,
+       avg(lows) AS avg_lows,
+       avg(on_hand) AS avg_on_hand
+FROM checkin_rollup
+GROUP BY department, category, date_trunc('week', checkin_date);
+"""
+
+# Recomputes the rollup rows for one day. %(groups)s limits it to the
+# (department, category) pairs an ingest touched; the full rebuild passes
+# no filter. Either way only that day's check-ins are read.
+REFRESH_QUERY = """
+INSERT INTO checkin_rollup AS R (department, category, checkin_date, articles, zeros, lows, on_hand)
+SELECT COALESCE(P.department, ''), COALESCE(P.category, ''), C.checkin_date,
+       count(*),
+       count(*) FILTER (
+           WHERE C.inventory <= 0
+             AND NOT EXISTS (SELECT 1 FROM dno AS D WHERE D.article = P.article_number AND D.active)
+       ),
+       count(*) FILTER (
+           WHERE C.inventory > 0
+             AND C.inventory <= COALESCE(CT.threshold, DT.threshold, %(default)s)
+       ),
+       COALESCE(sum(GREATEST(C.inventory, 0)), 0)
+FROM inventory_checkin AS C
+JOIN Products AS P ON P.id = C.product_id
+LEFT JOIN unnest(%(dept_keys)s::text[], %(dept_vals)s::real[]) AS DT (department, threshold)
+       ON DT.department = P.department
+LEFT JOIN unnest(%(cat_keys)s::text[], %(cat_vals)s::real[]) AS CT (category, threshold)
+       ON CT.category = P.category
+WHERE C.checkin_date = %(day)s
+  {group_filter}
+GROUP BY 1, 2, 3
+ON CONFLICT (department, category, checkin_date) DO UPDATE
+SET articles = EXCLUDED.articles,
+    zeros = EXCLUDED.zeros,
+    lows = EXCLUDED.lows,
+    on_hand = EXCLUDED.on_hand,
+    refreshed_at = now()
+"""
+
+# Groups present in the ingest's staging_inventory temp table
+STAGED_GROUPS = """
+  AND (COALESCE(P.department, ''), COALESCE(P.category, '')) IN (
+      SELECT DISTINCT COALESCE(P2.department, ''), COALESCE(P2.category, '')
+      FROM staging_inventory AS s
+      JOIN Products AS P2 ON P2.article_number = s.article_number
+  )
+"""
+
+TREND_QUERY = """
+SELECT department,
+       sum(zeros) FILTER (WHERE checkin_date = %(day)s),
+       sum(lows) FILTER (WHERE checkin_date = %(day)s),
+       sum(on_hand) FILTER (WHERE checkin_date = %(day)s),
+       sum(zeros) FILTER (WHERE checkin_date = %(week_ago)s)
+FROM checkin_rollup
+WHERE checkin_date IN (%(day)s, %(week_ago)s)
+GROUP BY department
+"""
+
+
+def ensure_rollup_schema(cur):
+    cur.execute("SELECT to_regclass('checkin_rollup_weekly')")
+    if cur.fetchone()[0] is None:
+        cur.execute(ROLLUP_SCHEMA)
+
+
+def refresh_staged(cur, rules, day):
+    """
+    Refreshes `day`'s rollup rows for the departments/categories in the
+    current transaction's staging_inventory table. Called by the ingest
+    right after its upsert, so the rollup commits together with the data.
+    Returns the number of rollup rows written.
+    """
+    ensure_rollup_schema(cur)
+    cur.execute(REFRESH_QUERY.format(group_filter=STAGED_GROUPS), {"day": day, **threshold_params(rules)})
+    return cur.rowcount
+
+
+def rebuild(cur, rules, start, end):
+    """Recomputes every rollup row from start to end (inclusive). Returns rows written."""
+    ensure_rollup_schema(cur)
+    params = threshold_params(rules)
+    written = 0
+    day = start
+    while day <= end:
+        cur.execute(REFRESH_QUERY.format(group_filter=""), {"day": day, **params})
+        written += cur.rowcount
+        day += timedelta(days=1)
+    return written
+
+
+def department_trend(cur, day=None):
+    """
+    {department: (zeros, lows, on_hand, zeros a week earlier)} for `day`.
+    Values are None where the rollup has no row for that date.
+    """
+    day = day or date.today()
+    cur.execute(TREND_QUERY, {"day": day, "week_ago": day - timedelta(days=7)})
+    return {department: tuple(values) for department, *values in cur.fetchall()}
+
+
+if __name__ == "__main__":
+    from db_pool import ConnectionManager
+    from rules import FilterRules
+
+    parser = argparse.ArgumentParser(description="Rebuild the per-department check-in rollups.")
+    parser.add_argument("--start", type=date.fromisoformat, required=True)
+    parser.add_argument("--end", type=date.fromisoformat, default=date.today())
+    args = parser.parse_args()
+
+    config = json.load(open('config.json'))
+    db = ConnectionManager(config)
+    with db.session() as (cur, conn):
+        count = rebuild(cur, FilterRules.from_config(config), args.start, args.end)
+    db.close_all()
+    print(f"Wrote {count} rollup rows for {args.start} .. {args.end}.")
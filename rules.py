@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+
+# Defaults used when config.json has no "rules" section
+DEFAULT_RULES = {
+    # Departments dictionary -> for the "lights" in UI
+    "departments": {
+        "Grocery": ["Grocery"],
+        "Meat": ["Meat", "Deli"],
+        "Bakery": ["Bakery Commercial", "Bakery Instore"],
+        "Dairy/Frozen": ["Bulk"],
+        "Seafood": ["Seafood"],
+        "HMR": ["HMR"],
+        "Produce": ["Produce"],
+        "Home": ["Home", "Entertainment"]
+    },
+    # Banned category prefixes (not to be reported)
+    "banned_category_prefixes": [
+        # Produce
+        "Nuts/ Dried Fruit", "Fresh-", "Field Veg", "Root Veg", "Salad Veg",
+        "Cooking Veg", "Peppers", "Tomatoes",
+        # Meat
+        "Lamb", "Sausage", "Hams",
+        # Entertainment
+        "Books-", "Magazines", "Newspapers"
+    ],
+    # Low threshold hyperparameter, overridable per department and per category
+    "low_threshold": 2,
+    "department_thresholds": {},
+    "category_thresholds": {},
+}
+
+
+class FilterRules:
+    """
+    Declarative filter rules for one store, compiled once into lookups that
+    work on whole columns:
+
+      - banned categories: str.startswith over a tuple of prefixes, evaluated
+        once per *distinct* category and broadcast back with isin
+      - department lights: dict from raw department name to light group
+      - low thresholds: default, then per-department (raw name or light
+        group), then per-category overrides, resolved with Series.map
+    """
+
+    def __init__(self, departments, banned_category_prefixes, low_threshold=2,
+                 department_thresholds=None, category_thresholds=None):
+        self.departments = {group: list(members) for group, members in departments.items()}
+        self.banned_prefixes = tuple(banned_category_prefixes)
+        self.low_threshold = float(low_threshold)
+        self.department_thresholds = dict(department_thresholds or {})
+        self.category_thresholds = dict(category_thresholds or {})
+
+        # Raw department -> light group
+        self._group_of = {
+            member: group
+            for group, members in self.departments.items()
+            for member in members
+        }
+
+        # Raw department -> threshold (a light-group key applies to all its members)
+        self._dept_threshold = {}
+        for key, value in self.department_thresholds.items():
+            for member in self.departments.get(key, [key]):
+                self._dept_threshold[member] = float(value)
+
+    @classmethod
+    def from_config(cls, config):
+        rules = {**DEFAULT_RULES, **config.get("rules", {})}
+        return cls(
+            rules["departments"],
+            rules["banned_category_prefixes"],
+            rules["low_threshold"],
+            rules["department_thresholds"],
+            rules["category_thresholds"],
+        )
+
+    # ----------------- Compiled Masks -----------------
+    def banned_mask(self, categories):
+        """Boolean mask of rows whose category starts with a banned prefix."""
+        if not self.banned_prefixes:
+            return np.zeros(len(categories), dtype=bool)
+        if isinstance(categories.dtype, pd.CategoricalDtype):
+            uniques = categories.cat.categories
+        else:
+            uniques = pd.unique(categories.dropna())
+        banned = [cat for cat in uniques if isinstance(cat, str) and cat.startswith(self.banned_prefixes)]
+        return categories.isin(banned).to_numpy()
+
+    def light_groups(self, departments):
+        """Light groups that have at least one row in the given department column."""
+        return {self._group_of[dep] for dep in pd.unique(departments.dropna()) if dep in self._group_of}
+
+    def group_of(self, department):
+        """Light group for a raw department name, or None."""
+        return self._group_of.get(department)
+
+    def low_thresholds(self, df):
+        """Per-row low threshold as a float array aligned with df."""
+        thresholds = pd.Series(self.low_threshold, index=df.index, dtype="float64")
+        if self._dept_threshold and "Department" in df.columns:
+            by_dept = df["Department"].map(self._dept_threshold)
+            thresholds = by_dept.astype("float64").fillna(thresholds)
+        if self.category_thresholds and "Merchandise Category" in df.columns:
+            by_cat = df["Merchandise Category"].map(self.category_thresholds)
+            thresholds = by_cat.astype("float64").fillna(thresholds)
+        return thresholds.to_numpy()
+
+    def threshold_maps(self):
+        """({raw department: threshold}, {category: threshold}) for server-side queries."""
+        return dict(self._dept_threshold), {k: float(v) for k, v in self.category_thresholds.items()}
+
+    def filter_banned(self, df):
+        return df[~self.banned_mask(df["Merchandise Category"])].reset_index(drop=True)
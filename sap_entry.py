@@ -0,0 +1,429 @@
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+DEFAULT_CHECKPOINT = "sap_checkpoint.json"
+
+# Screen stages the engine waits on:
+#   "entry"   -> the article field is focused and empty
+#   "confirm" -> SAP is showing the confirmation for the typed article
+STAGES = ("entry", "confirm")
+
+# Fixed pauses the old recursive process_lines used, kept as the fallback
+# when a backend can't observe the screen for a stage.
+FALLBACK_DELAYS = {"entry": 1.02, "confirm": 0.5}
+
+
+class EntryError(Exception):
+    """Raised when an article could not be entered after all retries."""
+
+
+class UncertainEntryError(EntryError):
+    """
+    The final Enter went out but SAP never came back to the entry screen, so
+    the article (or chunk) may or may not be in. Retrying could enter it
+    twice; the run stops instead, with the checkpoint still at `rows[0]`.
+    """
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+        what = f"Article {rows[0]}" if len(rows) == 1 else f"Chunk {rows[0]}..{rows[-1]} ({len(rows)} rows)"
+        super().__init__(f"{what} may or may not have been accepted; check SAP before resuming")
+
+
+# ----------------- Backends -----------------
+class InputBackend:
+    """
+    What the entry engine drives. is_ready(stage) returns True/False when the
+    backend can observe the screen, or None when it can't (the engine then
+    falls back to fixed delays for that stage).
+    """
+
+    def focus_entry(self):
+        raise NotImplementedError
+
+    def type_text(self, text):
+        raise NotImplementedError
+
+    def press_enter(self):
+        raise NotImplementedError
+
+    def is_ready(self, stage):
+        return None
+
+    # Bulk-paste mode (multi-row entry screen)
+    def paste_text(self, text):
+        raise NotImplementedError
+
+    def accepted_rows(self):
+        """Rows the screen is currently holding, or None if the backend can't tell."""
+        return None
+
+    def can_verify_paste(self):
+        """Whether accepted_rows() can count a pasted chunk; bulk paste is refused otherwise."""
+        return False
+
+    def cancel(self):
+        raise NotImplementedError
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+
+class PyAutoGUIBackend(InputBackend):
+    """
+    Drives the real SAP window with pyautogui.
+
+    ready_pixels maps a stage to (x, y, [r, g, b]); the stage counts as ready
+    once that pixel matches within `tolerance`. Stages without a pixel fall
+    back to fixed delays.
+
+    For bulk paste, rows go through the clipboard, and every paste is
+    verified by clicking readback_xy, selecting all and copying the grid
+    back, then counting the non-empty lines. Without readback_xy bulk paste
+    is unavailable.
+    """
+
+    def __init__(self, entry_xy=(222, 330), ready_pixels=None, tolerance=12, readback_xy=None):
+        import pyautogui  # only needed on the workstation
+        import pyperclip  # installed with pyautogui
+        self.pyautogui = pyautogui
+        self.pyperclip = pyperclip
+        self.entry_xy = tuple(entry_xy)
+        self.ready_pixels = {stage: (x, y, tuple(rgb)) for stage, (x, y, rgb) in (ready_pixels or {}).items()}
+        self.tolerance = tolerance
+        self.readback_xy = tuple(readback_xy) if readback_xy else None
+
+    @classmethod
+    def from_config(cls, config):
+        sap = config.get("sap", {})
+        return cls(
+            sap.get("entry_xy", (222, 330)),
+            sap.get("ready_pixels"),
+            sap.get("tolerance", 12),
+            sap.get("readback_xy"),
+        )
+
+    def focus_entry(self):
+        x, y = self.entry_xy
+        self.pyautogui.click(x, y)
+        self.pyautogui.click(x, y)
+
+    def type_text(self, text):
+        self.pyautogui.write(text)
+
+    def press_enter(self):
+        self.pyautogui.press('enter')
+
+    def is_ready(self, stage):
+        pixel = self.ready_pixels.get(stage)
+        if pixel is None:
+            return None
+        x, y, rgb = pixel
+        return self.pyautogui.pixelMatchesColor(x, y, rgb, tolerance=self.tolerance)
+
+    def paste_text(self, text):
+        self.pyperclip.copy(text)
+        self.pyautogui.hotkey('ctrl', 'v')
+
+    def accepted_rows(self):
+        if self.readback_xy is None:
+            return None
+        self.pyperclip.copy("")
+        self.pyautogui.click(*self.readback_xy)
+        self.pyautogui.hotkey('ctrl', 'a')
+        self.pyautogui.hotkey('ctrl', 'c')
+        self.sleep(0.2)
+        return sum(1 for line in self.pyperclip.paste().splitlines() if line.strip())
+
+    def can_verify_paste(self):
+        return self.readback_xy is not None
+
+    def cancel(self):
+        self.pyautogui.press('esc')
+
+
+class FakeBackend(InputBackend):
+    """
+    Headless stand-in for benchmarking and checking ordering.
+    The "screen" becomes ready `latency` seconds after each action, and every
+    `drop_every`-th keystroke batch is lost to exercise the retry path.
+    """
+
+    def __init__(self, latency=0.0, drop_every=0):
+        self.latency = latency
+        self.drop_every = drop_every
+        self.entered = []
+        self._typed = None
+        self._stage = "entry"
+        self._ready_at = 0.0
+        self._actions = 0
+
+    def _act(self):
+        self._actions += 1
+        self._ready_at = time.perf_counter() + self.latency
+        return not (self.drop_every and self._actions % self.drop_every == 0)
+
+    def focus_entry(self):
+        self._act()
+        self._stage = "entry"
+        self._typed = None
+
+    def type_text(self, text):
+        if self._act():
+            self._typed = text
+
+    def press_enter(self):
+        if not self._act():
+            return
+        if self._stage == "entry" and self._typed is not None:
+            self._stage = "confirm"
+        elif self._stage == "confirm":
+            if isinstance(self._typed, list):
+                self.entered.extend(self._typed)
+            else:
+                self.entered.append(self._typed)
+            self._stage = "entry"
+            self._typed = None
+
+    def is_ready(self, stage):
+        return self._stage == stage and time.perf_counter() >= self._ready_at
+
+    def paste_text(self, text):
+        rows = text.splitlines()
+        if not self._act():
+            rows = rows[:-1]  # a lost paste drops the last row
+        self._typed = rows
+
+    def accepted_rows(self):
+        return len(self._typed or [])
+
+    def can_verify_paste(self):
+        return True
+
+    def cancel(self):
+        self._act()
+        self._stage = "entry"
+        self._typed = None
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+
+# ----------------- Engine -----------------
+class SAPEntryEngine:
+    """
+    Iterative article entry with adaptive pacing and a resumable checkpoint.
+
+    Instead of sleeping a fixed time after each keystroke the engine polls
+    backend.is_ready(stage); it first waits its running estimate of how long
+    that stage takes, then polls every `poll` seconds up to `max_wait`.
+    If a stage never becomes ready the article is retried from the top --
+    except after the final Enter, where it may already be in SAP: that
+    stops the run with UncertainEntryError (see resolve_uncertain).
+
+    Progress is written to checkpoint_path after every article, keyed by the
+    exact ordered list, so re-running the same list resumes where it stopped.
+    """
+
+    def __init__(self, backend, checkpoint_path=DEFAULT_CHECKPOINT,
+                 poll=0.01, max_wait=4.0, retries=2, smoothing=0.2):
+        self.backend = backend
+        self.checkpoint_path = checkpoint_path
+        self.poll = poll
+        self.max_wait = max_wait
+        self.retries = retries
+        self.smoothing = smoothing
+        self.expected = {stage: 0.0 for stage in STAGES}
+
+    # ----------------- Checkpoint -----------------
+    @staticmethod
+    def run_key(articles):
+        return hashlib.sha1("\n".join(articles).encode()).hexdigest()
+
+    def load_checkpoint(self, key):
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return 0
+        try:
+            with open(self.checkpoint_path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        return state.get("done", 0) if state.get("key") == key else 0
+
+    def save_checkpoint(self, key, done, total, uncertain=0):
+        if not self.checkpoint_path:
+            return
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"key": key, "done": done, "total": total, "uncertain": uncertain}, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def resolve_uncertain(self, articles, accepted):
+        """
+        After an UncertainEntryError, records what the operator found in SAP.
+        If the rows were accepted, the checkpoint moves past them, so the next
+        run continues after them instead of entering them again.
+        """
+        if not accepted:
+            return
+        articles = [str(a).strip() for a in articles if str(a).strip()]
+        key = self.run_key(articles)
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return
+        with open(self.checkpoint_path) as f:
+            state = json.load(f)
+        if state.get("key") != key or not state.get("uncertain"):
+            return
+        self.save_checkpoint(key, min(state["done"] + state["uncertain"], len(articles)), len(articles))
+
+    def clear_checkpoint(self):
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    # ----------------- Pacing -----------------
+    def wait_ready(self, stage):
+        """Returns True once the stage is ready, False if it timed out."""
+        started = time.perf_counter()
+        if self.backend.is_ready(stage) is None:
+            self.backend.sleep(FALLBACK_DELAYS[stage])
+            return True
+
+        if self.expected[stage]:
+            self.backend.sleep(self.expected[stage])
+        if self.backend.is_ready(stage):
+            # Ready on the first look: we may have waited too long, probe earlier next time
+            self.expected[stage] *= 1 - self.smoothing
+            return True
+
+        while not self.backend.is_ready(stage):
+            if time.perf_counter() - started > self.max_wait:
+                return False
+            self.backend.sleep(self.poll)
+
+        took = time.perf_counter() - started
+        self.expected[stage] += self.smoothing * (took - self.expected[stage])
+        return True
+
+    # ----------------- Entry -----------------
+    def enter(self, article):
+        for _ in range(self.retries + 1):
+            self.backend.focus_entry()
+            if not self.wait_ready("entry"):
+                continue
+            self.backend.type_text(article)
+            self.backend.press_enter()
+            if not self.wait_ready("confirm"):
+                continue
+            self.backend.press_enter()
+            if self.wait_ready("entry"):
+                return
+            raise UncertainEntryError([article])
+        raise EntryError(f"Article {article} was not accepted after {self.retries + 1} attempts")
+
+    def enter_chunk(self, rows):
+        """
+        Pastes a block of articles into the multi-row entry screen in one go.
+        The row count is checked before confirming; on a mismatch the screen
+        is cancelled and the chunk retried, so nothing is half-submitted.
+        A chunk whose rows can't be counted is never confirmed.
+        """
+        text = "\n".join(rows)
+        for _ in range(self.retries + 1):
+            self.backend.focus_entry()
+            if not self.wait_ready("entry"):
+                continue
+            self.backend.paste_text(text)
+            accepted = self.backend.accepted_rows()
+            if accepted is None:
+                self.backend.cancel()
+                raise EntryError("Bulk paste needs the pasted rows read back; set sap.readback_xy in config.json")
+            if accepted != len(rows):
+                self.backend.cancel()
+                continue
+            self.backend.press_enter()
+            if not self.wait_ready("confirm"):
+                continue
+            self.backend.press_enter()
+            if self.wait_ready("entry"):
+                return
+            raise UncertainEntryError(rows)
+        raise EntryError(
+            f"Chunk starting at article {rows[0]} ({len(rows)} rows) was not accepted "
+            f"after {self.retries + 1} attempts"
+        )
+
+    def run(self, articles, progress=None, chunk_size=None):
+        """
+        Enters every article in order, resuming from the checkpoint if this
+        exact list was interrupted before. With chunk_size set, articles are
+        pasted `chunk_size` rows at a time instead of typed one by one.
+        progress(done, total) is called after each article or chunk.
+        Returns the number of articles entered this run.
+        """
+        if chunk_size and not self.backend.can_verify_paste():
+            raise EntryError("Bulk paste needs the pasted rows read back; set sap.readback_xy in config.json")
+        articles = [str(a).strip() for a in articles if str(a).strip()]
+        key = self.run_key(articles)
+        total = len(articles)
+        start = self.load_checkpoint(key)
+
+        step = chunk_size or 1
+        for i in range(start, total, step):
+            try:
+                if chunk_size:
+                    self.enter_chunk(articles[i:i + step])
+                else:
+                    self.enter(articles[i])
+            except UncertainEntryError as e:
+                self.save_checkpoint(key, i, total, uncertain=len(e.rows))
+                raise
+            done = min(i + step, total)
+            self.save_checkpoint(key, done, total)
+            if progress is not None:
+                progress(done, total)
+
+        self.clear_checkpoint()
+        return total - start
+
+
+# ----------------- Benchmark -----------------
+def benchmark(count, latency, drop_every, chunk_size=None):
+    backend = FakeBackend(latency=latency, drop_every=drop_every)
+    articles = [str(10000000 + i) for i in range(count)]
+    uncertain = 0
+
+    with tempfile.TemporaryDirectory() as state_dir:
+        engine = SAPEntryEngine(backend, checkpoint_path=os.path.join(state_dir, "checkpoint.json"))
+        started = time.perf_counter()
+        while True:
+            try:
+                engine.run(articles, chunk_size=chunk_size)
+                break
+            except UncertainEntryError as e:
+                # Play the operator: look at the "screen" and resume
+                uncertain += 1
+                engine.resolve_uncertain(articles, accepted=backend.entered[-len(e.rows):] == e.rows)
+        elapsed = time.perf_counter() - started
+
+    return {
+        "mode": f"paste x{chunk_size}" if chunk_size else "type",
+        "articles": count,
+        "seconds": round(elapsed, 3),
+        "articles_per_min": round(count / elapsed * 60, 1) if elapsed else None,
+        "order_ok": backend.entered == articles,
+        "uncertain_stops": uncertain,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the SAP entry engine against a fake backend.")
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated screen latency (s)")
+    parser.add_argument("--drop-every", type=int, default=0, help="lose every Nth keystroke")
+    parser.add_argument("--chunk-size", type=int, default=None, help="benchmark bulk-paste mode")
+    args = parser.parse_args()
+    print(json.dumps(benchmark(args.count, args.latency, args.drop_every, args.chunk_size)))
@@ -0,0 +1,158 @@
+import argparse
+import json
+from datetime import date
+
+# Long-format check-ins: one row per (product, date), range-partitioned by month.
+#   - the primary key (product_id, checkin_date) INCLUDE (inventory) serves
+#     history lookups as index-only scans
+#   - a BRIN index on checkin_date keeps date-range scans over a whole day
+#     or month cheap at almost no storage cost
+CHECKIN_TABLE = """
+CREATE TABLE IF NOT EXISTS inventory_checkin (
+    product_id integer NOT NULL REFERENCES products (id) ON DELETE CASCADE,
+    checkin_date date NOT NULL,
+    inventory real,
+    CONSTRAINT inventory_checkin_pkey PRIMARY KEY (product_id, checkin_date) INCLUDE (inventory)
+) PARTITION BY RANGE (checkin_date);
+
+CREATE INDEX IF NOT EXISTS inventory_checkin_date_brin
+    ON inventory_checkin USING brin (checkin_date);
+"""
+
+# Unpivots the old wide dailycheckin (d0..d6 per year/ISO week) into long rows.
+# The old pipeline stored the *calendar* year next to the ISO week, so
+# 2024-12-30 (ISO 2025-W01) sits in row (2024, 1). Each cell's ISO year is
+# therefore one of year-1, year, year+1: the one whose date falls in calendar
+# year `year`. Week-1 and week-52/53 cells can match two dates a year apart;
+# the cell holds whichever was written last, so the later one that is not in
+# the future is taken.
+DAILYCHECKIN_ROWS = """
+SELECT DC.product_id, c.checkin_date, d.inventory
+FROM dailycheckin AS DC
+CROSS JOIN LATERAL (VALUES
+    (0, DC.d0_inventory), (1, DC.d1_inventory), (2, DC.d2_inventory), (3, DC.d3_inventory),
+    (4, DC.d4_inventory), (5, DC.d5_inventory), (6, DC.d6_inventory)
+) AS d (day, inventory)
+CROSS JOIN LATERAL (
+    SELECT max(x.dt) AS checkin_date
+    FROM (
+        SELECT k, to_date((DC.year + k) || '-' || DC.week || '-' || (d.day + 1), 'IYYY-IW-ID') AS dt
+        FROM generate_series(-1, 1) AS k
+    ) AS x
+    WHERE extract(year FROM x.dt) = DC.year
+      AND extract(isoyear FROM x.dt) = DC.year + x.k  -- week 53 of a 52-week year rolls over; skip it
+      AND extract(week FROM x.dt) = DC.week
+      AND x.dt <= current_date
+) AS c
+WHERE d.inventory IS NOT NULL
+  AND c.checkin_date IS NOT NULL
+"""
+
+MIGRATE_DAILYCHECKIN = f"""
+INSERT INTO inventory_checkin (product_id, checkin_date, inventory)
+{DAILYCHECKIN_ROWS}
+ON CONFLICT (product_id, checkin_date) DO NOTHING
+"""
+
+
+def month_start(d):
+    return date(d.year, d.month, 1)
+
+
+def next_month(d):
+    return date(d.year + d.month // 12, d.month % 12 + 1, 1)
+
+
+def partition_name(d):
+    return f"inventory_checkin_y{d.year}m{d.month:02d}"
+
+
+def ensure_checkin_table(cur):
+    cur.execute("SELECT to_regclass('inventory_checkin')")
+    if cur.fetchone()[0] is None:
+        cur.execute(CHECKIN_TABLE)
+
+
+def ensure_partitions(cur, start, end):
+    """
+    Creates the monthly partitions covering start..end (inclusive) if missing.
+    Several workstations may hit a new month at once: a missing partition is
+    created under a transaction-scoped advisory lock, with IF NOT EXISTS, so
+    the second one waits for the first to commit and then finds the table.
+    """
+    month = month_start(start)
+    while month <= end:
+        name = partition_name(month)
+        cur.execute("SELECT to_regclass(%s)", (name,))
+        if cur.fetchone()[0] is None:
+            cur.execute("SELECT pg_advisory_xact_lock(hashtext('inventory_checkin partitions'))")
+            cur.execute(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF inventory_checkin "
+                f"FOR VALUES FROM (%s) TO (%s)",
+                (month, next_month(month))
+            )
+        month = next_month(month)
+
+
+def migrate_dailycheckin(cur):
+    """
+    Copies every non-null day of the wide dailycheckin table into
+    inventory_checkin, resolving the stored calendar year to the right ISO
+    year per day (see DAILYCHECKIN_ROWS). Safe to re-run; the old table is
+    left in place.
+    Returns the number of rows inserted.
+    """
+    ensure_checkin_table(cur)
+    cur.execute("SELECT to_regclass('dailycheckin')")
+    if cur.fetchone()[0] is None:
+        return 0
+
+    cur.execute(f"SELECT min(checkin_date), max(checkin_date) FROM ({DAILYCHECKIN_ROWS}) AS migrated")
+    first, last = cur.fetchone()
+    if first is None:
+        return 0
+    ensure_partitions(cur, first, last)
+    cur.execute(MIGRATE_DAILYCHECKIN)
+    return cur.rowcount
+
+
+def detach_partitions_before(cur, cutoff):
+    """
+    Detaches every monthly partition that ends on or before `cutoff`.
+    The detached tables stay in the database for archiving or DROP.
+    Returns the detached table names.
+    """
+    cur.execute("""
+        SELECT c.relname
+        FROM pg_inherits AS i
+        JOIN pg_class AS c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'inventory_checkin'::regclass
+        ORDER BY c.relname
+    """)
+    detached = []
+    for (name,) in cur.fetchall():
+        year, month = int(name[-7:-3]), int(name[-2:])
+        if next_month(date(year, month, 1)) <= cutoff:
+            cur.execute(f"ALTER TABLE inventory_checkin DETACH PARTITION {name}")
+            detached.append(name)
+    return detached
+
+
+if __name__ == "__main__":
+    from db_pool import ConnectionManager
+
+    parser = argparse.ArgumentParser(description="Check-in table migrations.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("migrate", help="create inventory_checkin and copy dailycheckin into it")
+    detach = sub.add_parser("detach", help="detach monthly partitions older than a date")
+    detach.add_argument("--before", type=date.fromisoformat, required=True)
+    args = parser.parse_args()
+
+    db = ConnectionManager(json.load(open('config.json')))
+    with db.session() as (cur, conn):
+        if args.command == "migrate":
+            print(f"Copied {migrate_dailycheckin(cur)} check-ins into inventory_checkin.")
+        else:
+            for name in detach_partitions_before(cur, args.before):
+                print(f"Detached {name}")
+    db.close_all()
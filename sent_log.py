@@ -0,0 +1,72 @@
+import sqlite3
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_LOG_PATH = "ingest_state.db"
+KEEP_DAYS = 7
+
+
+class SentLog:
+    """
+    Local record of the last inventory value sent to the server for each
+    article, per day. The pipeline uses it to ship only new or changed rows
+    when a file is re-uploaded or corrected mid-day.
+    """
+
+    def __init__(self, path=DEFAULT_LOG_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS sent (
+                day TEXT NOT NULL,
+                article TEXT NOT NULL,
+                inventory REAL,
+                PRIMARY KEY (day, article)
+            )
+        """)
+        self.conn.commit()
+
+    def load(self, day):
+        """Series of last-sent inventory indexed by article for the given day (ISO date)."""
+        with self._lock:
+            rows = self.conn.execute("SELECT article, inventory FROM sent WHERE day = ?", (day,)).fetchall()
+        return previous_values(rows)
+
+    def record(self, day, articles, inventories):
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO sent (day, article, inventory) VALUES (?, ?, ?) "
+                "ON CONFLICT (day, article) DO UPDATE SET inventory = excluded.inventory",
+                zip([day] * len(articles), articles, [None if pd.isna(v) else float(v) for v in inventories])
+            )
+            cutoff = (date.fromisoformat(day) - timedelta(days=KEEP_DAYS)).isoformat()
+            self.conn.execute("DELETE FROM sent WHERE day < ?", (cutoff,))
+
+    def close(self):
+        self.conn.close()
+
+
+def previous_values(rows):
+    """[(article, inventory), ...] -> Series indexed by article string."""
+    if not rows:
+        return pd.Series(dtype="float32")
+    articles, values = zip(*rows)
+    return pd.Series(values, index=[str(a) for a in articles], dtype="float32")
+
+
+def changed_mask(articles, inventories, previous):
+    """
+    True for rows that are new or whose inventory differs from `previous`.
+    Compared as float32, the precision of the server's real column.
+    """
+    if previous.empty:
+        return np.ones(len(articles), dtype=bool)
+    known = articles.isin(previous.index).to_numpy()
+    before = articles.map(previous).to_numpy(dtype="float32")
+    now = inventories.to_numpy(dtype="float32")
+    same = (before == now) | (np.isnan(before) & np.isnan(now))
+    return ~(known & same)
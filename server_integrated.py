@@ -2,11 +2,10 @@ import json
 import os
 import tkinter as tk
 from tkinter import filedialog, messagebox
-import pandas as pd
+import numpy as np
 import psycopg2
-import pyautogui
 import time
-from datetime import datetime, timedelta, date
+from datetime import timedelta, date
 import matplotlib
 from matplotlib import pyplot as plt
 
@@ -16,6 +15,23 @@ from matplotlib.figure import Figure
 import matplotlib.dates as mdates
 from tkinter import ttk  # For the Progressbar
 
+from db_pool import ConnectionManager, ServerUnavailable
+from dno_bulk import apply_bulk, read_article_list, summary_text, validate
+from dno_cache import DNOCache, cache_path_for
+from forecast import run_forecast, soon_zeros
+from history import HistoryService
+from journal import Journal, JournalFlusher
+from inventory_core import article_is_text, dno_articles, low_articles, parse_pool, parse_uploads, zero_articles
+from inventory_store import InventoryStore
+from metrics import Metrics
+from rollups import department_trend, ensure_rollup_schema
+from rules import FilterRules
+from sap_entry import PyAutoGUIBackend, SAPEntryEngine, UncertainEntryError
+from sent_log import SentLog
+from snapshots import SnapshotArchive
+from server_reports import by_department, ensure_report_schema, fetch_lows, fetch_zeros
+from task_runner import TaskRunner
+
 
 class FiltererApp:
     def __init__(self, root):
@@ -23,51 +39,72 @@ class FiltererApp:
         self.root.title("0 Filterer Server Edition")
 
         # ------------------------ Class Variables ------------------------
-        self.df_inventory = pd.DataFrame()  # Will hold your full Excel in-memory
+        self.inventory = InventoryStore()  # Will hold your full Excel in-memory, per department
         self.filtered_zeros = set()  # Articles with inventory <= 0 (not in DNO)
         self.filtered_lows = set()  # Articles with 0 < inventory <= low threshold
+        self.filtered_soon = set()  # Articles forecast to hit zero within FORECAST_WITHIN days
         self.zero_article_count = 0
         self.new_found_dnos = 0
 
         self.zero_button = None
         self.low_button = None
-        self.inputted = False  # for logging (if you use logs)
+        self.soon_button = None
+        self.sap_entered = {"zeros": 0, "lows": 0, "soon": 0}  # articles actually typed into SAP this session
+        self.session_started = time.time()
 
         # NEW: Track whether we've already sent inventory to postgres
         self.sent_to_postgres = False
 
-        # Low threshold hyperparameter
-        self.LOW_THRESHOLD = 2
-
-        # Departments dictionary -> for the "lights" in UI
-        self.departments = {
-            "Grocery": ["Grocery"],
-            "Meat": ["Meat", "Deli"],
-            "Bakery": ["Bakery Commercial", "Bakery Instore"],
-            "Dairy/Frozen": ["Bulk"],
-            "Seafood": ["Seafood"],
-            "HMR": ["HMR"],
-            "Produce": ["Produce"],
-            "Home": ["Home", "Entertainment"]
-        }
-
-        # Banned categories (not to be reported)
-        self.BANNED_CATS = [
-            # Produce
-            "Nuts/ Dried Fruit", "Fresh-", "Field Veg", "Root Veg", "Salad Veg",
-            "Cooking Veg", "Peppers", "Tomatoes",
-            # Meat
-            "Lamb", "Sausage", "Hams",
-            # Entertainment
-            "Books-", "Magazines", "Newspapers"
-        ]
+        # Worker pool + UI queue for anything that blocks (Excel, Postgres)
+        self.tasks = TaskRunner(root)
+        self.parse_pool = None  # process pool for parsing several workbooks at once, made on first use
 
-        self.lights_bool = {dep: False for dep in self.departments.keys()}
+        self.config = json.load(open('config.json'))
 
-        self.db_config = json.load(open('config.json'))
+        # Per-stage timings as JSON lines (optional "metrics" section of config.json)
+        self.metrics = Metrics.from_config(self.config)
 
+        # Banned categories, department lights and low thresholds,
+        # from the optional "rules" section of config.json
+        self.rules = FilterRules.from_config(self.config)
+        self.departments = self.rules.departments
 
-        self.conn = None
+        self.lights_bool = {dep: False for dep in self.departments.keys()}
+
+        # One pooled connection manager shared with InventoryPipeline
+        self.db = ConnectionManager(self.config)
+        self.DB_TIMEOUT_MS = 15000  # statement_timeout for interactive queries
+
+        # Every cleaned upload is also kept locally as Parquet ("snapshots" section of
+        # config.json); history falls back to it when the server is down or slow
+        self.archive = SnapshotArchive.from_config(self.config, metrics=self.metrics)
+
+        # Cached product history, dropped whenever an ingest finishes
+        self.history = HistoryService(self.db, timeout_ms=self.DB_TIMEOUT_MS, metrics=self.metrics,
+                                      archive=self.archive)
+
+        # Local copy of the active DNO list, delta-synced from the server
+        self.dno_cache = DNOCache(cache_path_for('config.json'))
+        self.DNO_MAX_AGE = 300  # seconds before find_zeros re-syncs the cache
+
+        # Stockout forecast over the stored history ("forecast" section of config.json)
+        forecast_config = self.config.get("forecast", {})
+        self.FORECAST_WEEKS = forecast_config.get("weeks", 13)
+        self.FORECAST_WITHIN = forecast_config.get("within_days", 7)
+        self.FORECAST_HALF_LIFE = forecast_config.get("half_life", 14)
+
+        # Last values sent per article today, for change-only ingest
+        self.sent_log = SentLog()
+
+        # Check-ins and DNO edits go to a local journal first; the flusher
+        # ships them in the background whenever the server is reachable
+        self.journal = Journal()
+        self.pipeline_window = None
+        self.flusher = JournalFlusher(
+            self.journal, self.db, self.sent_log, self.rules, metrics=self.metrics,
+            on_flushed=lambda kind, results: self.tasks.post(self.journal_flushed, kind, results),
+            on_backlog=lambda backlog: self.tasks.post(self.show_backlog, backlog),
+        )
 
         # ------------------------ UI SETUP ------------------------
         #
@@ -109,6 +146,14 @@ class FiltererApp:
         self.remove_ONE_btn = tk.Button(self.dno_frame, text="Remove from DNO", command=self.remove_from_DNO)
         self.remove_ONE_btn.grid(row=3, column=0, padx=5, pady=3, sticky="ew")
 
+        self.bulk_add_btn = tk.Button(self.dno_frame, text="Bulk Add from File...",
+                                      command=lambda: self.bulk_dno(True))
+        self.bulk_add_btn.grid(row=4, column=0, padx=5, pady=(12, 3), sticky="ew")
+
+        self.bulk_remove_btn = tk.Button(self.dno_frame, text="Bulk Remove from File...",
+                                         command=lambda: self.bulk_dno(False))
+        self.bulk_remove_btn.grid(row=5, column=0, padx=5, pady=3, sticky="ew")
+
         # Right side: Inventory & Filters
         self.inv_frame = tk.LabelFrame(self.control_frame, text="Inventory & Filters", padx=10, pady=10)
         self.inv_frame.grid(row=0, column=1, sticky="n", padx=(20, 0))
@@ -137,44 +182,97 @@ class FiltererApp:
         )
         self.graph_button.grid(row=6, column=0, padx=5, pady=5, sticky="ew")
 
+        # SAP submission mode: type one article at a time, or paste chunks
+        # into the multi-row entry screen
+        sap_config = self.config.get("sap", {})
+        self.SAP_CHUNK_SIZE = sap_config.get("chunk_size", 50)
+        # Pasted chunks are only confirmed after their row count is read back,
+        # so paste mode needs sap.readback_xy
+        self.SAP_CAN_PASTE = bool(sap_config.get("readback_xy"))
+        self.paste_mode = tk.BooleanVar(value=sap_config.get("mode") == "paste")
+        tk.Checkbutton(
+            self.inv_frame, text="Bulk paste to SAP", variable=self.paste_mode,
+            command=self.check_paste_mode
+        ).grid(row=7, column=0, padx=5, pady=5, sticky="w")
+        if self.paste_mode.get() and not self.SAP_CAN_PASTE:
+            self.root.after(0, self.check_paste_mode)  # configured but unverifiable: warn and fall back
+
+        self.forecast_btn = tk.Button(
+            self.inv_frame,
+            text=f"Forecast Zeros ({self.FORECAST_WITHIN} days)",
+            command=self.find_soon_zeros
+        )
+        self.forecast_btn.grid(row=8, column=0, padx=5, pady=5, sticky="ew")
+
+        # 3) SERVER SYNC STATUS (bottom)
+        self.backlog_label = tk.Label(root, text="Server sync: checking...", fg="gray")
+        self.backlog_label.pack(side=tk.BOTTOM, pady=(0, 10))
+
         # Final window close protocol
         self.root.protocol("WM_DELETE_WINDOW", self.close_app)
 
+        # Zero/low counts next to each light, from the server's rollups
+        self.refresh_light_counts()
 
-    # ----------------- Conn Helpers -----------------
+        # Ship anything left in the journal by an earlier session
+        self.flusher.start()
 
-    def get_cursor(self):
-        """
-        Returns a (cursor, conn).
-        If no existing connection, create one from self.db_config.
-        """
-        if self.conn is None:
-            try:
-                self.conn = psycopg2.connect(
-                    host=self.db_config['host'],
-                    dbname=self.db_config['dbname'],
-                    user=self.db_config['user'],
-                    password=self.db_config['password'],
-                    port=self.db_config['port'],
-                )
-            except psycopg2.Error as e:
-                self.show_alert(f"Error connecting to Server")
-                return None, None
-        cur = self.conn.cursor()
-        return cur, self.conn
 
-    def close_conn(self, cur):
+    # ----------------- Background Tasks -----------------
+    def run_task(self, button, fn, *args, on_done=None, on_error=None):
         """
-        Closes the given cursor, then closes self.conn if open,
-        finally sets self.conn = None.
+        Runs fn on the worker pool with `button` disabled until it finishes,
+        so the window keeps repainting while Excel parses or Postgres answers.
         """
-        if cur:
-            cur.close()
-        if self.conn:
-            self.conn.close()
-            self.conn = None
-
+        if button is not None:
+            button.config(state=tk.DISABLED)
+
+        def finish(callback, value):
+            if button is not None:
+                button.config(state=tk.NORMAL)
+            if callback is not None:
+                callback(value)
+
+        self.tasks.submit(
+            fn, *args,
+            on_done=lambda result: finish(on_done, result),
+            on_error=lambda error: finish(on_error or self.show_db_error, error)
+        )
 
+    def show_db_error(self, error):
+        if isinstance(error, ServerUnavailable):
+            self.show_alert("Failed to connect to the database.", "Connection Error")
+        elif isinstance(error, psycopg2.Error):
+            self.show_alert(f"Database error: {error}", "Error")
+        else:
+            self.show_alert(str(error), "Error")
+
+    # ----------------- Department Trends -----------------
+    def refresh_light_counts(self):
+        """Fetches today's per-department rollups and shows them next to the lights."""
+        def fetch():
+            with self.db.session(timeout_ms=self.DB_TIMEOUT_MS) as (cur, conn):
+                ensure_rollup_schema(cur)
+                return department_trend(cur)
+
+        # Trend numbers are a nice-to-have; stay quiet if the server is away
+        self.tasks.submit(fetch, on_done=self.show_light_counts, on_error=lambda error: None)
+
+    def show_light_counts(self, trend):
+        totals = {group: [0, 0, 0] for group in self.departments}  # zeros, lows, zeros a week ago
+        for department, (zeros, lows, on_hand, zeros_before) in trend.items():
+            group = self.rules.group_of(department)
+            if group is None:
+                continue
+            totals[group][0] += zeros or 0
+            totals[group][1] += lows or 0
+            totals[group][2] += zeros_before or 0
+
+        for group, (zeros, lows, zeros_before) in totals.items():
+            text = f"{group}  {zeros}Z/{lows}L"
+            if zeros_before:
+                text += f" ({zeros - zeros_before:+d} vs last wk)"
+            self.buttons[group].config(text=text)
 
     # ----------------- DNO: Add & Remove -----------------
     def add_new_DNO(self):
@@ -190,46 +288,79 @@ class FiltererApp:
         if not confirm:
             return
 
-        cur, conn = self.get_cursor()
-        if cur is None:
-            self.show_alert("Failed to connect to the database.", "Connection Error")
-            return
+        # The local cache may be stale, so it never blocks an edit: the journal
+        # replays idempotently and the newest edit wins on the server
+        already = newdno in self.dno_cache
 
-        try:
-            # PostgreSQL upsert: Insert new row or update 'active' to TRUE if it exists
-            upsert_query = """
-                INSERT INTO dno (article, active)
-                VALUES (%s, TRUE)
-                ON CONFLICT (article)
-                DO UPDATE SET active = TRUE
-            """
-            cur.execute(upsert_query, (newdno,))
-            conn.commit()
-
-            # Check if a new row was inserted or an existing row was updated
-            if cur.rowcount == 1:
-                self.show_alert(f"Article {newdno} has been added to DNO.", "Inserted")
-            elif cur.rowcount == 0:
-                self.show_alert(f"Article {newdno} was already active in DNO.", "Already Active")
+        def insert():
+            self.journal.append_dno(newdno, True)
+            self.dno_cache.apply_local(newdno, True)
 
+        def done(_):
+            note = "\n(It was already active in this machine's copy of the list.)" if already else ""
+            self.show_alert(f"Article {newdno} has been added to DNO.{note}", "Inserted")
             self.new_found_dnos += 1
+            self.flusher.kick()
 
-        except psycopg2.Error as e:
-            self.show_alert(f"Database error: {e}", "Error")
-        finally:
-            self.close_conn(cur)
+        self.run_task(self.add_ONE_btn, insert, on_done=done)
 
-    def fetch_dno_articles(self):
+    def fetch_dno_articles(self, as_text=False):
         """
-        Returns a list of articles stored in the remote DNO table.
+        Returns the active DNO articles as a sorted int64 array (str array
+        with as_text=True, for inventories with alphanumeric codes).
+        Served from the local cache; only rows changed on the server since
+        the last sync are pulled, and only once the cache is stale.
+
+        Blocking -- call from a worker thread.
         """
-        cur, _ = self.get_cursor()
-        try:
-            cur.execute("SELECT article FROM dno")
-            rows = cur.fetchall()
-            return [int(r[0]) for r in rows]
-        finally:
-            self.close_conn(cur)
+        return dno_articles(
+            self.db, self.dno_cache, self.DNO_MAX_AGE, self.DB_TIMEOUT_MS,
+            on_sync_error=lambda e: self.tasks.post(
+                self.show_alert, f"Could not sync DNO list, using local copy.\n{e}", "DNO Sync"
+            ),
+            metrics=self.metrics, as_text=as_text
+        )
+
+    # ----------------- Journal -----------------
+    def journal_flushed(self, kind, results):
+        """A journal batch reached the server (called on the Tk thread)."""
+        if kind == "dno":
+            self.sync_dno_cache()
+            return
+        self.history.invalidate()
+        self.refresh_light_counts()
+        if self.pipeline_window is not None:
+            self.pipeline_window.show_flushed(results)
+
+    def show_backlog(self, backlog):
+        waiting = []
+        if backlog["checkin"]:
+            waiting.append(f"{backlog['checkin']} check-in batch(es), {backlog['checkin_rows']} rows")
+        if backlog["dno"]:
+            waiting.append(f"{backlog['dno']} DNO edit(s)")
+        if waiting:
+            age = f", oldest {backlog['oldest'] // 60} min" if backlog["oldest"] else ""
+            text, color = "Waiting for server: " + "; ".join(waiting) + age, "dark orange"
+        else:
+            text, color = "Server sync: up to date", "dark green"
+        if backlog["dead"]:
+            text += f"  ({backlog['dead']} rejected, see journal.db)"
+            color = "red"
+        self.backlog_label.config(text=text, fg=color)
+
+    def pull_dno_changes(self):
+        with self.db.session(timeout_ms=self.DB_TIMEOUT_MS) as (cur, conn):
+            return self.dno_cache.sync(cur)
+
+    def sync_dno_cache(self):
+        """
+        Pulls DNO changes into the local cache in the background. If the server
+        can't be reached we keep filtering against the last synced copy.
+        """
+        self.run_task(
+            None, self.pull_dno_changes,
+            on_error=lambda e: self.show_alert(f"Could not sync DNO list, using local copy.\n{e}", "DNO Sync")
+        )
 
     def remove_from_DNO(self):
         bad_dno = self.entry.get().strip()
@@ -239,146 +370,304 @@ class FiltererApp:
             "Confirm Action",
             f"Set active to FALSE for Article {bad_dno}? Read the article number carefully."
         )
-        if confirm:
-            cur, conn = self.get_cursor()
-            if cur is None:
-                self.show_alert("Failed to connect to the database.", "Connection Error")
-                return
-            try:
-                # Update the 'active' column to FALSE for the specified article
-                cur.execute("UPDATE dno SET active = FALSE WHERE article = %s", (bad_dno,))
-                conn.commit()
-
-                if cur.rowcount > 0:
-                    self.show_alert(f"Article {bad_dno} has been deactivated.", "Article Deactivated")
-                    self.new_found_dnos += 1
-                else:
-                    self.show_alert(f"Article {bad_dno} was not found or is already inactive.", "Article Not Found")
-            except psycopg2.Error as e:
-                self.show_alert(f"Database error: {e}", "Error")
-            finally:
-                self.close_conn(cur)
+        if not confirm:
+            return
 
-    # ----------------- Excel Upload & Department Lights -----------------
-    def upload_excel(self):
-        file_path = filedialog.askopenfilename(filetypes=[("Excel Workbooks", "*.xlsx")])
+        # Journaled even if the (possibly stale) local cache doesn't list it
+        known = bad_dno in self.dno_cache
+
+        def deactivate():
+            self.journal.append_dno(bad_dno, False)
+            self.dno_cache.apply_local(bad_dno, False)
+
+        def done(_):
+            note = "" if known else "\n(It was not active in this machine's copy of the list.)"
+            self.show_alert(f"Article {bad_dno} has been deactivated.{note}", "Article Deactivated")
+            self.new_found_dnos += 1
+            self.flusher.kick()
+
+        self.run_task(self.remove_ONE_btn, deactivate, on_done=done)
+
+    def bulk_dno(self, active):
+        """
+        Adds (or removes) every article in a .txt/.csv/.xlsx list: the list
+        is checked against products on the server, one summary is shown, and
+        the confirmed changes are applied in a single transaction.
+        """
+        file_path = filedialog.askopenfilename(
+            filetypes=[("Article lists", "*.txt *.csv *.xlsx"), ("All files", "*.*")]
+        )
         if not file_path:
             return
+        button = self.bulk_add_btn if active else self.bulk_remove_btn
 
-        new_df = pd.read_excel(file_path, engine='openpyxl')
+        def check():
+            articles, invalid = read_article_list(file_path)
+            with self.db.session(timeout_ms=self.DB_TIMEOUT_MS) as (cur, conn):
+                return validate(cur, articles, active, invalid)
 
-        # Department-lights logic (reading from "Department"?)
-        if "Department" in new_df.columns:
-            departments_in_file = new_df["Department"]
-            for dep in departments_in_file:
-                for outer_key, inner_values in self.departments.items():
-                    if dep in inner_values:
-                        self.lights_bool[outer_key] = True
-                        self.lights[outer_key].itemconfig("light", fill="green")
-                        break
+        def confirm(plan):
+            if not plan.to_change:
+                self.show_alert(summary_text(plan), "Nothing to Change")
+                return
+            if messagebox.askokcancel("Confirm Bulk DNO", summary_text(plan)):
+                self.run_task(button, apply, plan.to_change, on_done=done)
 
-        # Filter out banned categories & store final result in memory
-        columns_needed = ['Department', 'Merchandise Category', 'Article Description', 'Article', 'Inventory']
+        def apply(articles):
+            with self.metrics.stage("dno_bulk", active=active, articles=len(articles)) as fields:
+                with self.db.session(timeout_ms=self.DB_TIMEOUT_MS) as (cur, conn):
+                    fields["rows"] = apply_bulk(cur, articles, active)
+            return fields["rows"]
 
-        new_df = new_df[columns_needed].copy()
+        def done(changed):
+            self.show_alert(f"{changed} article(s) {'added to' if active else 'removed from'} DNO.",
+                            "Bulk DNO")
+            self.new_found_dnos += changed
+            self.sync_dno_cache()
 
-        # Function to check if a category is banned
-        def is_banned(cat):
-            return any(cat.startswith(bad) for bad in self.BANNED_CATS if isinstance(cat, str))
+        self.run_task(button, check, on_done=confirm)
 
-        new_df = new_df[~new_df["Merchandise Category"].apply(is_banned)].reset_index(drop=True)
+    # ----------------- Excel Upload & Department Lights -----------------
+    def upload_excel(self):
+        file_paths = filedialog.askopenfilenames(filetypes=[("Excel Workbooks", "*.xlsx")])
+        if not file_paths:
+            return
 
-        # Append new data to existing data
-        if self.df_inventory.empty:
-            self.df_inventory = new_df
-        else:
-            self.df_inventory = pd.concat([self.df_inventory, new_df], ignore_index=True)
+        self.upload_button.config(text=f"Loading 0/{len(file_paths)}...")
+        self.run_task(self.upload_button, self.load_excel, list(file_paths), on_done=self.merge_upload)
+
+    @property
+    def df_inventory(self):
+        """Merged, article-unique view over every department uploaded so far."""
+        return self.inventory.frame
+
+    def load_excel(self, file_paths):
+        """
+        Parses and filters the workbooks, several at once in the process pool.
+        Blocking -- runs on a worker thread. Each finished file lights its
+        departments (yellow until the merge) and is archived to the local
+        snapshots; returns parse_uploads' result.
+        """
+        pool = None
+        if len(file_paths) > 1:
+            if self.parse_pool is None:
+                self.parse_pool = parse_pool(os.cpu_count() or 1)
+            pool = self.parse_pool
 
-        # Drop duplicates by Article, keep last
-        if "Article" in self.df_inventory.columns:
-            self.df_inventory.drop_duplicates(subset=["Article"], keep="last", inplace=True, ignore_index=True)
+        parsed = []
 
+        def on_parsed(file_path, lit):
+            parsed.append(file_path)
+            self.tasks.post(self.show_parse_progress, lit, len(parsed), len(file_paths))
+
+        parsed_files, failed = parse_uploads(file_paths, self.rules, pool, on_parsed, metrics=self.metrics)
+        for file_path, df, _ in parsed_files:
+            try:
+                self.archive.append(df)
+            except Exception as e:  # the archive is a convenience; never fail an upload over it
+                self.metrics.record("snapshot_write", ok=False, file=os.path.basename(file_path), error=str(e))
+        return parsed_files, failed
+
+    def show_parse_progress(self, lit, done, total):
+        for outer_key in lit:
+            if not self.lights_bool[outer_key]:
+                self.lights[outer_key].itemconfig("light", fill="yellow")
+        self.upload_button.config(text=f"Loading {done}/{total}...")
+
+    def merge_upload(self, result):
+        parsed, failed = result
+        self.upload_button.config(text="Upload Excel")
+
+        # Store by department; a re-uploaded department replaces its old rows.
+        # The merged frame is only rebuilt once, the next time it's read.
+        replaced = []
+        for file_path, new_df, lit in parsed:
+            for outer_key in lit:
+                self.lights_bool[outer_key] = True
+                self.lights[outer_key].itemconfig("light", fill="green")
+            replaced += self.inventory.upsert(new_df, file_path)
+
+        if failed:
+            self.show_alert(
+                "Could not read:\n" + "\n".join(f"{os.path.basename(p)}: {e}" for p, e in failed.items()),
+                "Upload Error"
+            )
+        if not parsed:
+            return
+
+        # New rows since the last send: allow another (change-only) send
+        self.sent_to_postgres = False
+        self.send_to_server_btn.config(state=tk.NORMAL)
+        if replaced:
+            self.show_alert(
+                "Replaced previously loaded rows for: " + ", ".join(str(d) for d in replaced),
+                "Department Reloaded"
+            )
 
     # ----------------- Find Zeros & Lows -----------------
     def find_zeros(self):
         if self.df_inventory.empty:
-            self.show_alert("No inventory loaded. Please upload Excel first.", "Error")
+            self.find_from_server(zeros=True)
             return
 
-        zero_inventory_df = self.df_inventory[self.df_inventory["Inventory"] <= 0].copy()
-        dno_articles = self.fetch_dno_articles()
-        zero_inventory_df = zero_inventory_df[~zero_inventory_df["Article"].isin(dno_articles)]
+        df_inventory = self.df_inventory
+
+        def compute():
+            dno = self.fetch_dno_articles(as_text=article_is_text(df_inventory))
+            with self.metrics.stage("find_zeros", rows=len(df_inventory)) as stage:
+                zeros = zero_articles(df_inventory, dno)
+                stage["articles"] = len(zeros)
+            return zeros
 
-        unique_zero_articles = zero_inventory_df["Article"].dropna().unique()
-        self.filtered_zeros.update(int(article) for article in unique_zero_articles)
+        def done(unique_zero_articles):
+            self.filtered_zeros.update(int(article) if str(article).isdigit() else article for article in unique_zero_articles)
 
-        zero_count = len(self.filtered_zeros)
-        self.update_zero_text(zero_count)
+            zero_count = len(self.filtered_zeros)
+            self.update_zero_text(zero_count)
 
-        self.show_alert("Zero-inventory articles processed.\nReady to send to SAP.", "Success")
+            self.show_alert("Zero-inventory articles processed.\nReady to send to SAP.", "Success")
+
+        self.run_task(self.find_zeros_btn, compute, on_done=done)
 
     def find_lows(self):
         if self.df_inventory.empty:
-            self.show_alert("No inventory loaded. Please upload Excel first.", "Error")
+            self.find_from_server(zeros=False)
             return
 
-        low_inventory_df = self.df_inventory[
-            (self.df_inventory["Inventory"] > 0) &
-            (self.df_inventory["Inventory"] <= self.LOW_THRESHOLD)
-            ].copy()
-
-        unique_low_articles = low_inventory_df["Article"].dropna().unique()
-        self.filtered_lows.update(int(article) for article in unique_low_articles)
+        unique_low_articles = low_articles(self.df_inventory, self.rules)
+        self.filtered_lows.update(int(article) if str(article).isdigit() else article for article in unique_low_articles)
 
         low_count = len(self.filtered_lows)
         self.update_low_text(low_count)
 
         self.show_alert("Low-inventory articles found.\nReady to send to SAP.", "Success")
 
-    # ----------------- Send to SAP -----------------
-    def send_to_SAP(self, mode=0):
-        entryx = 222
-        entryy = 330
+    def find_from_server(self, zeros):
+        """
+        No Excel on this workstation: compute zeros/lows from today's
+        snapshot on the server instead (another workstation already sent it).
+        """
+        confirm = messagebox.askokcancel(
+            "No Inventory Loaded",
+            "No Excel is loaded on this computer.\n\nUse today's inventory already sent to the server?"
+        )
+        if not confirm:
+            return
 
-        def process_lines(data_list):
-            if not data_list:
+        def compute():
+            with self.db.session(timeout_ms=self.DB_TIMEOUT_MS) as (cur, conn):
+                ensure_report_schema(cur)
+                if zeros:
+                    return fetch_zeros(cur)
+                return fetch_lows(cur, self.rules)
+
+        def done(rows):
+            if not rows:
+                self.show_alert("The server has no matching articles for today.\n"
+                                "Has today's inventory been sent yet?", "Nothing Found")
                 return
-            line = str(data_list.pop(0)).strip()
-            if line:
-                pyautogui.click(entryx, entryy)
-                pyautogui.click(entryx, entryy)
-                time.sleep(1.02)
-                pyautogui.write(line)
-                pyautogui.press('enter')
-                time.sleep(0.5)
-                pyautogui.press('enter')
-                time.sleep(0.5)
-            process_lines(data_list)
+            articles = (int(a) if a.isdigit() else a for a, _ in rows)
+            if zeros:
+                self.filtered_zeros.update(articles)
+                self.update_zero_text(len(self.filtered_zeros))
+            else:
+                self.filtered_lows.update(articles)
+                self.update_low_text(len(self.filtered_lows))
+            counts = ", ".join(f"{dep}: {len(arts)}" for dep, arts in by_department(rows).items())
+            self.show_alert(f"{len(rows)} articles from today's server snapshot.\n{counts}", "Success")
+
+        self.run_task(self.find_zeros_btn if zeros else self.find_lows_btn, compute, on_done=done)
+
+    def find_soon_zeros(self):
+        """Articles the stored history says will run out within FORECAST_WITHIN days."""
+        def compute():
+            with self.db.session() as (cur, conn):
+                result = run_forecast(cur, self.FORECAST_WEEKS, self.FORECAST_HALF_LIFE)
+            return soon_zeros(result, self.FORECAST_WITHIN)
+
+        def done(rows):
+            # Already-zero articles are on the zeros list, not this one
+            self.filtered_soon = {int(a) if a.isdigit() else a for a, _, _ in rows} - self.filtered_zeros
+            self.update_soon_text(len(self.filtered_soon))
+            counts = ", ".join(f"{dep}: {len(arts)}" for dep, arts in by_department(
+                [(a, dep) for a, dep, _ in rows]).items())
+            self.show_alert(
+                f"{len(self.filtered_soon)} articles forecast to hit zero within "
+                f"{self.FORECAST_WITHIN} days.\n{counts}", "Forecast"
+            )
 
-        if mode == 1:
-            file_length = len(self.filtered_lows)
-            confirm = messagebox.askokcancel(
-                "Confirm Action",
-                f"Make sure the SAP window is in the far-left position.\nETA: {file_length * 2 // 60} mins.",
-                parent=self.root
+        self.run_task(self.forecast_btn, compute, on_done=done)
+
+    # ----------------- Send to SAP -----------------
+    def check_paste_mode(self):
+        if self.paste_mode.get() and not self.SAP_CAN_PASTE:
+            self.paste_mode.set(False)
+            self.show_alert(
+                "Bulk paste checks every pasted chunk's row count before confirming it, which needs "
+                '"readback_xy" in the "sap" section of config.json. Typing one article at a time instead.',
+                "Bulk Paste Unavailable"
             )
-            if confirm:
-                time.sleep(2)
-                data_to_process = list(self.filtered_lows)
-                process_lines(data_to_process)
-                self.show_alert("Low-inventory articles sent to SAP.", "Done")
+
+    def send_to_SAP(self, mode=0):
+        if mode == 1:
+            articles, label, button, lead_in, kind = self.filtered_lows, "Low-inventory", self.low_button, 2, "lows"
+        elif mode == 2:
+            articles, label, button, lead_in, kind = self.filtered_soon, "Forecast-zero", self.soon_button, 2, "soon"
         else:
-            file_length = len(self.filtered_zeros)
-            confirm = messagebox.askokcancel(
-                "Confirm Action",
-                f"Make sure the SAP window is in the far-left position.\nETA: {file_length * 2 // 60} mins.",
-                parent=self.root
+            articles, label, button, lead_in, kind = self.filtered_zeros, "Zero-inventory", self.zero_button, 3, "zeros"
+
+        # Sorted so the same list always maps to the same checkpoint
+        data_to_process = sorted(str(a) for a in articles)
+        file_length = len(data_to_process)
+
+        chunk_size = self.SAP_CHUNK_SIZE if self.paste_mode.get() else None
+        if chunk_size:
+            eta_seconds = -(-file_length // chunk_size) * 5  # ~5 s per pasted chunk
+        else:
+            eta_seconds = file_length * 2
+        confirm = messagebox.askokcancel(
+            "Confirm Action",
+            f"Make sure the SAP window is in the far-left position.\nETA: {eta_seconds // 60} mins.",
+            parent=self.root
+        )
+        if not confirm:
+            return
+
+        engine = SAPEntryEngine(PyAutoGUIBackend.from_config(self.config))
+
+        def enter_all():
+            time.sleep(lead_in)
+            started = time.perf_counter()
+            with self.metrics.stage("sap_entry", list=kind, mode="paste" if chunk_size else "type") as stage:
+                entered = engine.run(data_to_process, chunk_size=chunk_size)
+                minutes = (time.perf_counter() - started) / 60
+                stage.update(articles=entered, articles_per_min=round(entered / minutes, 1) if minutes else None)
+            return entered
+
+        def done(entered):
+            self.sap_entered[kind] += entered
+            self.show_alert(f"{label} articles sent to SAP.", "Done")
+
+        def stopped(error):
+            if isinstance(error, UncertainEntryError):
+                # The last Enter may have gone through: ask rather than risk entering it twice
+                accepted = messagebox.askyesno(
+                    "SAP Entry",
+                    f"SAP entry stopped: {error}.\n\nIs {error.rows[-1]} already in SAP?\n"
+                    "Yes: the next send continues after it. No: the next send enters it again.",
+                    parent=self.root
+                )
+                engine.resolve_uncertain(data_to_process, accepted)
+                return
+            self.show_alert(
+                f"SAP entry stopped: {error}\nSend the same list again to resume where it left off.", "SAP Entry"
             )
-            if confirm:
-                time.sleep(3)
-                data_to_process = list(self.filtered_zeros)
-                process_lines(data_to_process)
-                self.show_alert("Zero-inventory articles sent to SAP.", "Done")
+
+        self.run_task(
+            button, enter_all,
+            on_done=done,
+            on_error=stopped
+        )
 
     # ----------------- Button Label Updates -----------------
     def update_low_text(self, article_count: int):
@@ -401,6 +690,16 @@ class FiltererApp:
         )
         self.zero_button.grid(row=4, column=0, padx=5, pady=5, sticky="ew")
 
+    def update_soon_text(self, article_count: int):
+        if self.soon_button:
+            self.soon_button.destroy()
+        self.soon_button = tk.Button(
+            self.inv_frame,
+            text=f"Send {article_count} Soon-Zeros to SAP",
+            command=lambda: self.send_to_SAP(2)
+        )
+        self.soon_button.grid(row=9, column=0, padx=5, pady=5, sticky="ew")
+
     def open_send_inventory_window(self):
         # If inventory is empty or if we've already sent, just bail
         if self.df_inventory.empty:
@@ -410,16 +709,16 @@ class FiltererApp:
             return
 
         # Create a new Toplevel window for the pipeline
-        InventoryPipeline(self.root, self.df_inventory, self.db_config, parent_app=self)
+        self.pipeline_window = InventoryPipeline(self.root, self.df_inventory, self.db, parent_app=self)
         self.sent_to_postgres = True
 
     def open_time_series_window(self):
         """
         Opens a new Toplevel window that lets the user input:
-          - Article ID
-          - Start Week
-          - End Week
-        Then queries postgres to fetch the time series from DailyCheckIn + Products
+          - Article ID(s), comma separated
+          - Start Week (YYYY-WW)
+          - End Week (YYYY-WW)
+        Then fetches the time series through the HistoryService
         and plots the results in a Matplotlib figure.
         """
         # Create the Toplevel
@@ -427,21 +726,21 @@ class FiltererApp:
         self.top_ts.title("Time Series Options")
 
         # For convenience, store some default values
-        current_week = datetime.now().isocalendar()[1]
+        iso_year, current_week, _ = date.today().isocalendar()
 
         # Labels and Entries
-        tk.Label(self.top_ts, text="Article ID:").grid(row=0, column=0, padx=5, pady=5, sticky="e")
+        tk.Label(self.top_ts, text="Article ID(s):").grid(row=0, column=0, padx=5, pady=5, sticky="e")
         article_entry = tk.Entry(self.top_ts)
         article_entry.grid(row=0, column=1, padx=5, pady=5, sticky="w")
 
-        tk.Label(self.top_ts, text="Start Week:").grid(row=1, column=0, padx=5, pady=5, sticky="e")
+        tk.Label(self.top_ts, text="Start Week (YYYY-WW):").grid(row=1, column=0, padx=5, pady=5, sticky="e")
         start_entry = tk.Entry(self.top_ts)
-        start_entry.insert(0, "0")  # Default to week 0
+        start_entry.insert(0, f"{iso_year}-01")  # Default to the first week of this year
         start_entry.grid(row=1, column=1, padx=5, pady=5, sticky="w")
 
-        tk.Label(self.top_ts, text="End Week:").grid(row=2, column=0, padx=5, pady=5, sticky="e")
+        tk.Label(self.top_ts, text="End Week (YYYY-WW):").grid(row=2, column=0, padx=5, pady=5, sticky="e")
         end_entry = tk.Entry(self.top_ts)
-        end_entry.insert(0, str(current_week))  # Default to current ISO week
+        end_entry.insert(0, f"{iso_year}-{current_week:02d}")  # Default to current ISO week
         end_entry.grid(row=2, column=1, padx=5, pady=5, sticky="w")
 
         # Button to execute the query and plot
@@ -478,98 +777,63 @@ class FiltererApp:
         # Step 3: From that Monday, move forward (iso_week - 1) weeks and (iso_day - 1) days
         return first_monday + timedelta(weeks=(iso_week - 1), days=(iso_day - 1))
 
-    def fetch_time_series(self, article_id, start_week, end_week):
+    def parse_iso_week(self, text, default):
         """
-        Fetches inventory data from the database for the specified article
-        and week range. Returns (rows, product_description, article_id).
-
-        Each row in 'rows' will look like:
-          (year, week, D0_inventory, D1_inventory, D2_inventory, D3_inventory, D4_inventory, D5_inventory, D6_inventory)
+        Parses "YYYY-WW" (or a bare week number, read as this ISO year)
+        into (iso_year, iso_week). Falls back to `default` on bad input.
         """
-        conn = None
         try:
-            cur, conn = self.get_cursor()
-            if cur is None:
-                return None, None, None
-
-            # Fetch product description
-            description_query = "SELECT description FROM Products WHERE article_number = %s"
-            cur.execute(description_query, (article_id,))
-            description_result = cur.fetchone()
-            if not description_result:
-                self.show_alert(f"No product found for Article ID: {article_id}", "Error")
-                return None, None, None
-            product_description = description_result[0]
-
-            # Fetch time-series data
-            sql_query = """
-            SELECT DC.year, DC.week, DC.D0_inventory, DC.D1_inventory, DC.D2_inventory,
-                   DC.D3_inventory, DC.D4_inventory, DC.D5_inventory, DC.D6_inventory
-            FROM DailyCheckIn AS DC
-            JOIN Products AS P ON DC.product_id = P.id
-            WHERE P.article_number = %s
-              AND DC.week >= %s
-              AND DC.week <= %s
-            ORDER BY DC.year, DC.week
-            """
-            cur.execute(sql_query, (article_id, start_week, end_week))
-            rows = cur.fetchall()
-
-            return rows, product_description, article_id
-
-        except psycopg2.Error as e:
-            self.show_alert(str(e), "PostgreSQL Error")
-            return None, None, None
-        finally:
-            self.close_conn(cur)
+            if "-" in text:
+                year_str, week_str = text.strip().split("-", 1)
+                return int(year_str), int(week_str)
+            return date.today().isocalendar()[0], int(text)
+        except ValueError:
+            return default
 
+    def fetch_time_series(self, articles, start_date, end_date):
+        """
+        Fetches inventory history for one or many articles over
+        start_date..end_date (inclusive), in one query, through the cached
+        HistoryService. Returns {article: History}; unknown articles are absent.
+        Blocking -- runs on a worker thread; database errors propagate.
+        """
+        return self.history.fetch(articles, start_date, end_date)
 
     def plot_time_series(self, article_str, start_week_str, end_week_str):
         """
-        Plots the inventory time series for the given article and week range.
+        Plots the inventory time series for the given article(s) and week range.
+        Year and week are both honoured, so ranges may cross New Year.
 
         Args:
-            article_str (str): The article number.
-            start_week_str (str): The starting week number as a string.
-            end_week_str (str): The ending week number as a string.
+            article_str (str): One article number, or several separated by commas.
+            start_week_str (str): The starting week as "YYYY-WW".
+            end_week_str (str): The ending week as "YYYY-WW".
         """
-        # Convert week strings to integers, handle invalid inputs
-        try:
-            start_week = int(start_week_str)
-        except ValueError:
-            start_week = 0
-
-        try:
-            end_week = int(end_week_str)
-        except ValueError:
-            end_week = datetime.now().isocalendar()[1]
-
-        # Fetch data
-        rows, description, article_id = self.fetch_time_series(article_str, start_week, end_week)
-        if not rows:
+        iso_year, current_week, _ = date.today().isocalendar()
+        start_year, start_week = self.parse_iso_week(start_week_str, (iso_year, 1))
+        end_year, end_week = self.parse_iso_week(end_week_str, (iso_year, current_week))
+
+        start_date = self.iso_to_date(start_year, start_week, 1)
+        end_date = self.iso_to_date(end_year, end_week, 7)
+        articles = [a.strip() for a in article_str.split(",") if a.strip()]
+        if not articles:
             return
 
-        # Prepare data for plotting
-        plot_dates = []
-        plot_inventories = []
-
-        for (yr, wk, D0, D1, D2, D3, D4, D5, D6) in rows:
-            daily_invs = [D0, D1, D2, D3, D4, D5, D6]
-            for day_num, inventory in enumerate(daily_invs):
-                if inventory is None:
-                    continue  # Skip None inventories to ensure last point is valid
-                iso_day = day_num + 1  # D0=1 (Monday), D1=2 (Tuesday), ..., D6=7 (Sunday)
-
-                dt = self.iso_to_date(yr, wk, iso_day)
-
-                plot_dates.append(dt)
-                plot_inventories.append(inventory)
-
+        # Fetch data off the UI thread (one query for every article), draw when it arrives
+        self.run_task(
+            None, self.fetch_time_series, articles, start_date, end_date,
+            on_done=lambda histories: self.draw_time_series(articles, histories)
+        )
 
-        # Sort the data by date
-        paired = sorted(zip(plot_dates, plot_inventories), key=lambda x: x[0])
-        sorted_dates, sorted_inventories = zip(*paired)
+    def draw_time_series(self, articles, histories):
+        unknown = [a for a in articles if a not in histories]
+        if unknown:
+            self.show_alert(f"No product found for Article ID: {', '.join(unknown)}", "Error")
+        histories = [h for h in histories.values() if len(h.dates)]
+        if not histories:
+            return
 
+        article_str = ", ".join(h.article for h in histories)
         # Create a chart window
         chart_window = tk.Toplevel(self.root)
         chart_window.title(f"Time Series for Article {article_str}")
@@ -578,25 +842,31 @@ class FiltererApp:
         fig = Figure(figsize=(10, 6), dpi=100, facecolor='black')
         ax = fig.add_subplot(111)
 
-        # Plot the data
-        ax.plot(
-            sorted_dates, sorted_inventories,
-            marker='o', linestyle='-', color='red', label="Inventory"
-        )
+        # Plot the data, one line per article
+        colors = ['red', 'deepskyblue', 'yellow', 'lime', 'orange', 'violet']
+        for i, history in enumerate(histories):
+            ax.plot(
+                history.dates, history.values,
+                marker='o', linestyle='-', color=colors[i % len(colors)],
+                label="Inventory" if len(histories) == 1 else f"{history.article} {history.description}"
+            )
 
         # Set facecolor to match the figure
         ax.set_facecolor('black')
 
         # Set title and labels with white color for visibility on dark background
+        title = histories[0].description if len(histories) == 1 else "Products"
         ax.set_title(
-            f"{description} (Article {article_str}) Inventory Over Time",
+            f"{title} (Article {article_str}) Inventory Over Time",
             fontsize=16, color='white'
         )
         ax.set_xlabel("Date", fontsize=12, color='white')
         ax.set_ylabel("Inventory", fontsize=12, color='white')
 
         # Configure x-axis with dynamic date labels
-        day_span = (sorted_dates[-1] - sorted_dates[0]).days
+        first = min(h.dates[0] for h in histories)
+        last = max(h.dates[-1] for h in histories)
+        day_span = int((last - first) / np.timedelta64(1, 'D'))
         if day_span <= 14:
             # Label every day
             locator = mdates.DayLocator(interval=1)
@@ -641,7 +911,9 @@ class FiltererApp:
         messagebox.showinfo(title, message)
     def close_app(self):
         """
-        1) If self.sent_to_postgres is still False, we run the pipeline (so data isn't lost).
+        1) If self.sent_to_postgres is still False, we journal the inventory (so data isn't lost)
+           and only shut down once it is safely on disk; the flusher gets one last try to
+           ship the journal, and anything left goes out next session.
         2) Then handle logging, etc.
         3) Finally, destroy the root window.
         """
@@ -649,48 +921,79 @@ class FiltererApp:
             # Attempt to send data automatically
             # We'll do it *without* the Toplevel UI in this forced scenario,
             # but you can also do it with Toplevel if you want the user to see the progress.
-            InventoryPipeline(self.root, self.df_inventory, self.db_config, parent_app=self, auto_mode=True)
-
-        # 2) Optional logging if self.inputted is used:
-        if self.inputted:
-            log_message = (
-                f"Session Ended: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
-                f"Zeros sent: {len(self.filtered_zeros)}\n"
-                f"Lows sent: {len(self.filtered_lows)}\n"
-                f"{self.new_found_dnos} new DNO articles were tracked.\n"
-                "--------------------------------------------\n"
-            )
-            with open("log.txt", "a") as f:
-                f.write(log_message)
+            self.sent_to_postgres = True
+            InventoryPipeline(self.root, self.df_inventory, self.db, parent_app=self, auto_mode=True,
+                              on_finished=self.shutdown)
+            return
+
+        self.shutdown()
+
+    def shutdown(self):
+        # 2) One summary record per session, next to the per-stage timings
+        self.metrics.record(
+            "session", time.time() - self.session_started,
+            zeros_found=len(self.filtered_zeros),
+            lows_found=len(self.filtered_lows),
+            soon_found=len(self.filtered_soon),
+            sap_entered=dict(self.sap_entered),
+            dno_changes=self.new_found_dnos,
+            departments=sorted(str(d) for d in self.inventory.loaded_files()),
+            pool=self.db.stats(),
+        )
 
-        # 3) Destroy the app
+        # 3) Destroy the app (waits for any task still talking to the server)
+        flusher_stopped = self.flusher.stop(timeout=10)
+        self.tasks.shutdown(wait=True)
+        if self.parse_pool is not None:
+            self.parse_pool.shutdown()
+        self.dno_cache.close()
+        if flusher_stopped:
+            # Otherwise a flush is still in flight on the (daemon) flusher thread:
+            # what it uses stays open and goes away with the process
+            self.sent_log.close()
+            self.journal.close()
+            self.db.close_all()
+            self.metrics.close()
         self.root.destroy()
 
-import threading
+
 class InventoryPipeline(tk.Toplevel):
     """
-    Toplevel window to send the DataFrame's inventory to postgres row-by-row,
-    displaying a progress bar and logging newly discovered products
-    in a text box.
+    Toplevel window that hands the DataFrame's inventory to the local
+    journal and then shows the background flusher's progress: the COPY +
+    set-based upsert into postgres, and any newly discovered products.
+    The window can be closed at any time; the data is already safe on disk.
 
     If auto_mode=True, we won't actually show this window. Instead,
-    we do the insertion quietly (used on close_app).
+    we journal the inventory quietly (used on close_app).
+
+    With delta=True (the default) only rows whose inventory differs from
+    what was last sent today are shipped when the batch is flushed; the
+    last-sent values come from the local SentLog, or from one bulk query.
+
+    Journaling runs on the parent app's TaskRunner; results come back
+    through its UI queue, never straight from a worker.
     """
 
-    def __init__(self, master, df_inventory, db_config, parent_app, auto_mode=False, *args, **kwargs):
+    def __init__(self, master, df_inventory, db, parent_app, auto_mode=False, on_finished=None, delta=True,
+                 *args, **kwargs):
         super().__init__(master, *args, **kwargs)
         self.master = master
         self.parent_app = parent_app
         self.df_inventory = df_inventory
-        self.db_config = db_config
+        self.db = db
+        self.tasks = parent_app.tasks
+        self.journal = parent_app.journal
         self.auto_mode = auto_mode
+        self.on_finished = on_finished
+        self.delta = delta
 
         # If auto_mode is False, we build the GUI
         if not self.auto_mode:
             self.title("Sending Inventory to Server")
             self.geometry("500x400")
 
-            self.progress_label = ttk.Label(self, text="Progress:")
+            self.progress_label = ttk.Label(self, text="Saving locally...")
             self.progress_label.pack(pady=(15, 0))
 
             self.progress_bar = ttk.Progressbar(self, orient="horizontal", length=400, mode="determinate")
@@ -700,96 +1003,62 @@ class InventoryPipeline(tk.Toplevel):
             self.log_text = tk.Text(self, width=60, height=12)
             self.log_text.pack(pady=10)
 
-        # Start the pipeline
-        threading.Thread(target=self.send_data_to_postgres).start()
+            ttk.Button(self, text="Close", command=self.close).pack()
+            self.protocol("WM_DELETE_WINDOW", self.close)
 
-    def send_data_to_postgres(self):
-        total_rows = len(self.df_inventory)
-        progress_val = 0
+        else:
+            self.withdraw()
 
-        try:
-            conn = psycopg2.connect(
-                host=self.db_config['host'],
-                dbname=self.db_config['dbname'],
-                user=self.db_config['user'],
-                password=self.db_config['password'],
-                port=self.db_config['port'],
-            )
-            cur = conn.cursor()
-        except psycopg2.Error as e:
-            messagebox.showerror("PostgreSQL Error", str(e), parent=self.master)
-            self.destroy()
-            return
+        # Start the pipeline
+        self.tasks.submit(self.send_data_to_postgres, on_done=self.finish, on_error=self.fail)
 
-        try:
-            # Get current date details
-            today = datetime.now()
-            current_year = today.year
-            current_week = today.isocalendar()[1]
-            current_weekday = today.weekday()  # 0=Monday, 6=Sunday
-
-            # Map current_weekday to D0 to D6
-            day_column = f"D{current_weekday}_inventory"
-
-            for i, row in self.df_inventory.iterrows():
-                department = row.get("Department", "")
-                category = row.get("Merchandise Category", "")
-                description = row.get("Article Description", "")
-                article = str(row.get("Article", None))
-                inventory = row.get("Inventory", None)
-
-                if pd.isna(article):
-                    continue
-
-                # Check if product exists
-                cur.execute("SELECT id FROM Products WHERE article_number = %s", (article,))
-                product = cur.fetchone()
-
-                if not product:
-                    # Insert as new product
-                    cur.execute("""
-                        INSERT INTO Products (article_number, description, department, category)
-                        VALUES (%s, %s, %s, %s)
-                        RETURNING id
-                    """, (article, description, department, category))
-                    product_id = cur.fetchone()[0]
-                    conn.commit()
-
-                    if not self.auto_mode:
-                        self.log_text.insert(tk.END, f"New product discovered: {description}\n")
-                        self.log_text.see(tk.END)
-                else:
-                    product_id = product[0]
-
-                # Upsert into DailyCheckIn
-                cur.execute("""
-                    INSERT INTO DailyCheckIn (product_id, year, week, {day_col})
-                    VALUES (%s, %s, %s, %s)
-                    ON CONFLICT (product_id, year, week)
-                    DO UPDATE SET {day_col} = EXCLUDED.{day_col}
-                """.format(day_col=day_column),
-                            (product_id, current_year, current_week, inventory))
-                conn.commit()
-
-                # Update progress
-                progress_val += 1
-                if not self.auto_mode:
-                    self.progress_bar['value'] = progress_val
-                    self.progress_bar['maximum'] = total_rows
-                    if total_rows > 0:
-                        pct = int((progress_val / total_rows) * 100)
-                        self.progress_label.config(text=f"Progress: {pct}%")
-                    self.update_idletasks()
-
-        except psycopg2.Error as e:
-            messagebox.showerror("PostgreSQL Error", str(e), parent=self.master)
-        finally:
-            cur.close()
-            conn.close()
+    def send_data_to_postgres(self):
+        """
+        Worker-thread side of the pipeline: one local journal append.
+        Returns the number of rows journaled; errors propagate to fail().
+        """
+        self.journal.append_checkin(self.df_inventory, delta=self.delta)
+        return len(self.df_inventory)
 
+    def finish(self, rows):
         self.parent_app.sent_to_postgres = True
         self.parent_app.send_to_server_btn.config(state=tk.DISABLED)
+        self.parent_app.flusher.kick()
+        if self.auto_mode:
+            self.close()
+            return
+
+        self._show_progress(1, 2)
+        self.progress_label.config(text="Saved locally. Sending to server in the background...")
+        self.log_text.insert(tk.END, f"Saved {rows} rows to the local journal.\n")
+
+    def show_flushed(self, result):
+        """Called by the app when a check-in batch has reached the server."""
+        new_products, sent, skipped = result
+        for description in new_products:
+            self.log_text.insert(tk.END, f"New product discovered: {description}\n")
+        self.log_text.insert(tk.END, f"Sent {sent} new/changed rows, skipped {skipped} unchanged.\n")
+        self.log_text.see(tk.END)
+        self._show_progress(2, 2)
+        self.progress_label.config(text="Done.")
+
+    def fail(self, error):
+        messagebox.showerror("Journal Error", f"Could not save the inventory locally:\n{error}", parent=self.master)
+        # Leave the inventory unsent so the user can retry
+        self.parent_app.sent_to_postgres = False
+        self.parent_app.send_to_server_btn.config(state=tk.NORMAL)
+        self.close()
+
+    def close(self):
+        if self.parent_app.pipeline_window is self:
+            self.parent_app.pipeline_window = None
         self.destroy()
+        if self.on_finished is not None:
+            self.on_finished()
+
+    def _show_progress(self, done, total):
+        self.progress_bar['maximum'] = total
+        self.progress_bar['value'] = done
 
 
 # ----------------- MAIN -----------------
@@ -0,0 +1,103 @@
+import argparse
+import json
+from datetime import date
+
+# Supporting index + a view other tools can select from directly.
+#   - (checkin_date, inventory) INCLUDE (product_id) lets "today's rows with
+#     inventory <= x" be answered from the index alone
+REPORT_SCHEMA = """
+CREATE INDEX IF NOT EXISTS inventory_checkin_date_inventory_idx
+    ON inventory_checkin (checkin_date, inventory) INCLUDE (product_id);
+
+CREATE OR REPLACE VIEW todays_zeros AS
+SELECT P.article_number, P.description, P.department, P.category
+FROM inventory_checkin AS C
+JOIN Products AS P ON P.id = C.product_id
+WHERE C.checkin_date = current_date
+  AND C.inventory <= 0
+  AND NOT EXISTS (SELECT 1 FROM dno AS D WHERE D.article = P.article_number AND D.active);
+"""
+
+ZEROS_QUERY = """
+SELECT P.article_number, P.department
+FROM inventory_checkin AS C
+JOIN Products AS P ON P.id = C.product_id
+WHERE C.checkin_date = %(day)s
+  AND C.inventory <= 0
+  AND NOT EXISTS (SELECT 1 FROM dno AS D WHERE D.article = P.article_number AND D.active)
+ORDER BY P.department, P.article_number
+"""
+
+# Thresholds are passed as parallel arrays and resolved like FilterRules.low_thresholds:
+# category override, then department override, then the default.
+LOWS_QUERY = """
+SELECT P.article_number, P.department
+FROM inventory_checkin AS C
+JOIN Products AS P ON P.id = C.product_id
+LEFT JOIN unnest(%(dept_keys)s::text[], %(dept_vals)s::real[]) AS DT (department, threshold)
+       ON DT.department = P.department
+LEFT JOIN unnest(%(cat_keys)s::text[], %(cat_vals)s::real[]) AS CT (category, threshold)
+       ON CT.category = P.category
+WHERE C.checkin_date = %(day)s
+  AND C.inventory > 0
+  AND C.inventory <= %(max_threshold)s
+  AND C.inventory <= COALESCE(CT.threshold, DT.threshold, %(default)s)
+ORDER BY P.department, P.article_number
+"""
+
+
+def ensure_report_schema(cur):
+    cur.execute("SELECT to_regclass('todays_zeros')")
+    if cur.fetchone()[0] is None:
+        cur.execute(REPORT_SCHEMA)
+
+
+def threshold_params(rules):
+    dept_map, cat_map = rules.threshold_maps()
+    return {
+        "dept_keys": list(dept_map), "dept_vals": list(dept_map.values()),
+        "cat_keys": list(cat_map), "cat_vals": list(cat_map.values()),
+        "default": rules.low_threshold,
+        # Lets the (checkin_date, inventory) index bound the scan
+        "max_threshold": max([rules.low_threshold, *dept_map.values(), *cat_map.values()]),
+    }
+
+
+def fetch_zeros(cur, day=None):
+    """[(article_number, department), ...] with inventory <= 0 on `day`, active DNOs excluded."""
+    cur.execute(ZEROS_QUERY, {"day": day or date.today()})
+    return cur.fetchall()
+
+
+def fetch_lows(cur, rules, day=None):
+    """[(article_number, department), ...] with 0 < inventory <= their low threshold on `day`."""
+    cur.execute(LOWS_QUERY, {"day": day or date.today(), **threshold_params(rules)})
+    return cur.fetchall()
+
+
+def by_department(rows):
+    grouped = {}
+    for article, department in rows:
+        grouped.setdefault(department, []).append(article)
+    return grouped
+
+
+if __name__ == "__main__":
+    from db_pool import ConnectionManager
+    from rules import FilterRules
+
+    parser = argparse.ArgumentParser(description="Today's zeros/lows computed on the server.")
+    parser.add_argument("report", choices=["zeros", "lows"])
+    parser.add_argument("--date", type=date.fromisoformat, default=None)
+    args = parser.parse_args()
+
+    config = json.load(open('config.json'))
+    db = ConnectionManager(config)
+    with db.session() as (cur, conn):
+        ensure_report_schema(cur)
+        if args.report == "zeros":
+            rows = fetch_zeros(cur, args.date)
+        else:
+            rows = fetch_lows(cur, FilterRules.from_config(config), args.date)
+    db.close_all()
+    print(json.dumps(by_department(rows), indent=2))
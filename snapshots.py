@@ -0,0 +1,172 @@
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+
+from excel_reader import HAS_PYARROW
+from history import frame_to_histories
+
+if HAS_PYARROW:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    # One file per (day, department) upload; dates and departments live in
+    # the directory names (date=2026-01-15/department=Meat/), so a date or
+    # department filter never opens the other directories
+    PARTITION_SCHEMA = pa.schema([("date", pa.date32()), ("department", pa.string())])
+    ARCHIVE_SCHEMA = pa.schema([
+        ("date", pa.date32()),
+        ("department", pa.string()),
+        ("article", pa.string()),
+        ("description", pa.string()),
+        ("category", pa.string()),
+        ("inventory", pa.float32()),
+    ])  # in ARCHIVE_COLUMNS order
+
+ARCHIVE_COLUMNS = ["date", "department", "article", "description", "category", "inventory"]
+DEFAULT_ARCHIVE_PATH = "snapshots"
+DEFAULT_KEEP_DAYS = 400
+NO_DEPARTMENT = "(none)"
+ROW_GROUP_ROWS = 16384  # small enough that article filters can skip most row groups
+
+
+class SnapshotArchive:
+    """
+    Local Parquet archive of every cleaned upload, partitioned by date and
+    department, so history questions can be answered on this machine when
+    the server is slow or down.
+
+    Re-uploading a department on the same day replaces that day's partition,
+    matching how InventoryStore treats corrected files. Reads are memory-mapped,
+    and date/department filters prune whole directories. Rows are sorted by
+    article, so article filters skip row groups using their min/max statistics.
+    Without pyarrow the archive is disabled: appends do nothing and reads
+    come back empty.
+    """
+
+    def __init__(self, path=DEFAULT_ARCHIVE_PATH, keep_days=DEFAULT_KEEP_DAYS, metrics=None):
+        self.path = path
+        self.keep_days = keep_days
+        self.metrics = metrics
+        self.enabled = HAS_PYARROW and bool(path)
+        self._lock = threading.Lock()  # uploads and history reads may run on different workers
+
+    @classmethod
+    def from_config(cls, config, metrics=None):
+        section = config.get("snapshots", {})
+        return cls(
+            path=section.get("path", DEFAULT_ARCHIVE_PATH),
+            keep_days=section.get("keep_days", DEFAULT_KEEP_DAYS),
+            metrics=metrics,
+        )
+
+    # ----------------- Writing -----------------
+    def append(self, df, day=None):
+        """
+        Archives one cleaned inventory frame (canonical columns) for `day`
+        (default today). Returns the number of rows written.
+        """
+        if not self.enabled or df.empty:
+            return 0
+        started = time.perf_counter()
+        day = day or date.today()
+        frame = pd.DataFrame({
+            "date": day,
+            "department": df["Department"].astype(object).fillna(NO_DEPARTMENT),
+            "article": df["Article"].astype(str),
+            "description": df["Article Description"],
+            "category": df["Merchandise Category"].astype(object),
+            "inventory": df["Inventory"].astype("float32"),
+        }).sort_values(["department", "article"], kind="stable")
+        table = pa.Table.from_pandas(frame, schema=ARCHIVE_SCHEMA, preserve_index=False)
+
+        with self._lock:
+            ds.write_dataset(
+                table, self.path, format="parquet",
+                partitioning=ds.partitioning(PARTITION_SCHEMA, flavor="hive"),
+                existing_data_behavior="delete_matching",
+                basename_template="part-{i}.parquet",
+                max_rows_per_group=ROW_GROUP_ROWS,
+                min_rows_per_group=min(ROW_GROUP_ROWS, len(frame)),
+            )
+            self.prune()
+        if self.metrics is not None:
+            self.metrics.record("snapshot_write", time.perf_counter() - started, ok=True, rows=len(frame))
+        return len(frame)
+
+    def prune(self, keep_days=None):
+        """Drops day partitions older than keep_days."""
+        keep_days = self.keep_days if keep_days is None else keep_days
+        if not keep_days or not os.path.isdir(self.path):
+            return
+        cutoff = (date.today() - timedelta(days=keep_days)).isoformat()
+        for name in os.listdir(self.path):
+            if name.startswith("date=") and name[len("date="):] < cutoff:
+                shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+    # ----------------- Reading -----------------
+    def read(self, articles=None, start=None, end=None, departments=None, columns=None):
+        """
+        Archived rows matching every given filter, as a DataFrame with the
+        ARCHIVE_COLUMNS (or just `columns`). Filters are pushed down to the
+        Parquet scan rather than applied after loading.
+        """
+        names = columns or ARCHIVE_COLUMNS
+        if not self.enabled or not os.path.isdir(self.path):
+            return pd.DataFrame(columns=names)
+
+        predicates = []
+        if start is not None:
+            predicates.append(ds.field("date") >= pa.scalar(start, pa.date32()))
+        if end is not None:
+            predicates.append(ds.field("date") <= pa.scalar(end, pa.date32()))
+        if departments is not None:
+            predicates.append(pc.is_in(ds.field("department"), pa.array([str(d) for d in departments])))
+        if articles is not None:
+            predicates.append(pc.is_in(ds.field("article"), pa.array([str(a) for a in articles])))
+        condition = None
+        for predicate in predicates:
+            condition = predicate if condition is None else condition & predicate
+
+        with self._lock:
+            table = pq.read_table(
+                self.path, columns=names, filters=condition, memory_map=True,
+                partitioning=ds.partitioning(PARTITION_SCHEMA, flavor="hive"),
+            )
+        return table.to_pandas()
+
+    def histories(self, articles, start_date, end_date):
+        """{article: History} from the archive, in the same shape HistoryService returns."""
+        started = time.perf_counter()
+        df = self.read(articles=articles, start=start_date, end=end_date,
+                       columns=["article", "description", "date", "inventory"])
+        histories = frame_to_histories(df.sort_values(["article", "date"], kind="stable"))
+        if self.metrics is not None:
+            self.metrics.record("snapshot_query", time.perf_counter() - started, ok=True,
+                                articles=len(histories), rows=len(df))
+        return histories
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the local inventory snapshot archive; prints CSV.")
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--article", action="append", help="article number (repeatable)")
+    parser.add_argument("--department", action="append", help="raw department name (repeatable)")
+    parser.add_argument("--days", type=int, default=90, help="how many days back from today")
+    args = parser.parse_args()
+
+    config = json.load(open(args.config)) if os.path.exists(args.config) else {}
+    archive = SnapshotArchive.from_config(config)
+    if not archive.enabled:
+        raise SystemExit("The snapshot archive needs pyarrow (pip install pyarrow).")
+    print(archive.read(
+        articles=args.article, departments=args.department,
+        start=date.today() - timedelta(days=args.days), end=date.today(),
+    ).to_csv(index=False), end="")
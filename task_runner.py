@@ -0,0 +1,64 @@
+import queue
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TaskRunner:
+    """
+    Runs blocking work (Excel parsing, Postgres queries) on a small thread
+    pool and hands results back to Tk.
+
+    Worker threads must never touch widgets. Instead they call post(), which
+    queues a callback; the Tk main loop drains that queue every poll_ms
+    with root.after, so every UI update happens on the main thread.
+    """
+
+    def __init__(self, root, max_workers=4, poll_ms=50):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="filterer")
+        self.ui_queue = queue.Queue()
+        self._closed = False
+        self.root.after(self.poll_ms, self._drain)
+
+    def post(self, callback, *args, **kwargs):
+        """Schedules callback(*args, **kwargs) on the Tk main thread. Safe from any thread."""
+        self.ui_queue.put((callback, args, kwargs))
+
+    def submit(self, fn, *args, on_done=None, on_error=None, **kwargs):
+        """
+        Runs fn(*args, **kwargs) on a worker thread.
+        on_done(result) / on_error(exception) are called back on the main thread.
+        Errors without an on_error handler go to Tk's report_callback_exception.
+        """
+        def run():
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                self.post(on_error or self._report, e)
+                return
+            if on_done is not None:
+                self.post(on_done, result)
+
+        return self.executor.submit(run)
+
+    def _report(self, error):
+        self.root.report_callback_exception(type(error), error, error.__traceback__)
+
+    def _drain(self):
+        while True:
+            try:
+                callback, args, kwargs = self.ui_queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                callback(*args, **kwargs)
+            except Exception:
+                self.root.report_callback_exception(*sys.exc_info())
+
+        if not self._closed:
+            self.root.after(self.poll_ms, self._drain)
+
+    def shutdown(self, wait=True):
+        self._closed = True
+        self.executor.shutdown(wait=wait, cancel_futures=True)
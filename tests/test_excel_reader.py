@@ -0,0 +1,56 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from excel_reader import read_inventory  # noqa: E402
+from inventory_core import article_is_text, zero_articles  # noqa: E402
+
+pytest.importorskip("openpyxl")
+
+
+def write_workbook(path, articles, inventory):
+    pd.DataFrame({
+        "Department": ["Grocery"] * len(articles),
+        "Merchandise Category": ["Snacks"] * len(articles),
+        "Article Description": [f"Item {a}" for a in articles],
+        "Article": articles,
+        "Inventory": inventory,
+    }).to_excel(path, index=False)
+
+
+def zeros_for(df, dno):
+    """zero_articles with the DNO list in the shape the app passes for this frame."""
+    if article_is_text(df):
+        dno = np.array(sorted(str(a) for a in dno), dtype=object)
+    else:
+        dno = np.array(sorted(int(a) for a in dno if str(a).isdigit()), dtype=np.int64)
+    return sorted(str(a) for a in zero_articles(df, dno))
+
+
+@pytest.mark.parametrize("articles, dno, expected", [
+    (["A1", 8888, 1234], ["A1"], ["8888"]),  # alphanumeric store: text articles
+    ([7777, 8888, 1234], [7777], ["8888"]),  # numeric store: int64 articles
+])
+def test_cache_hit_matches_cache_miss(tmp_path, articles, dno, expected):
+    workbook = tmp_path / "grocery.xlsx"
+    write_workbook(workbook, articles, [0, 0, 5])
+    cache_dir = tmp_path / "cache"
+
+    fresh = read_inventory(str(workbook), str(cache_dir))  # cache miss: parses the xlsx
+    cached = read_inventory(str(workbook), str(cache_dir))  # cache hit: Parquet or pickle
+
+    assert len(os.listdir(cache_dir)) == 1
+    assert cached["Article"].dtype == fresh["Article"].dtype
+    assert article_is_text(cached) == article_is_text(fresh)
+    assert zeros_for(fresh, dno) == expected
+    assert zeros_for(cached, dno) == expected
+
+
+def test_str_dtype_articles_count_as_text():
+    df = pd.DataFrame({"Article": pd.array(["A1", "8888"], dtype="string")})
+    assert article_is_text(df)
@@ -0,0 +1,72 @@
+import os
+import random
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from excel_reader import canonicalize, concat_inventory  # noqa: E402
+from inventory_store import InventoryStore  # noqa: E402
+
+
+def upload(department, articles):
+    return canonicalize(pd.DataFrame({
+        "Department": [department] * len(articles),
+        "Merchandise Category": [f"{department} category"] * len(articles),
+        "Article Description": [f"{department} {a}" for a in articles],
+        "Article": articles,
+        "Inventory": np.arange(len(articles), dtype="float32"),
+    }))
+
+
+def rebuilt(store):
+    """What a from-scratch merge of every loaded department gives."""
+    combined = concat_inventory(store._departments.values())
+    return combined.drop_duplicates(subset=["Article"], keep="last")
+
+
+def rows_of(df):
+    return sorted(zip(df["Article"].astype(str), df["Article Description"]))
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_incremental_frame_matches_rebuild(seed):
+    rng = random.Random(seed)
+    store = InventoryStore()
+    store.upsert(upload("Meat", [1, 2, 3]))
+    store.frame  # built once; every later change is merged into it
+    for _ in range(15):
+        department = rng.choice(["Meat", "Dairy", "Produce", "Bakery"])
+        if rng.random() < 0.2:
+            store.remove_department(department)
+        else:
+            store.upsert(upload(department, rng.sample(range(40), rng.randint(1, 12))))
+        if store.empty:
+            assert store.frame.empty
+            continue
+        frame = store.frame
+        assert rows_of(frame) == rows_of(rebuilt(store))
+        assert frame["Article"].dtype == np.int64
+        assert frame["Department"].dtype == "category"
+        assert frame["Merchandise Category"].dtype == "category"
+
+
+def test_reupload_hands_dropped_articles_to_older_department():
+    store = InventoryStore()
+    store.upsert(upload("Meat", [1, 2]))
+    store.upsert(upload("Deli", [2, 3]))
+    store.frame
+    store.upsert(upload("Deli", [3]))  # article 2 no longer in Deli: Meat's row is back
+    assert rows_of(store.frame) == [("1", "Meat 1"), ("2", "Meat 2"), ("3", "Deli 3")]
+
+
+def test_text_upload_switches_frame_to_text_articles():
+    store = InventoryStore()
+    store.upsert(upload("Meat", [1, 2]))
+    store.frame
+    store.upsert(upload("Deli", ["X7", 2]))
+    assert rows_of(store.frame) == [("1", "Meat 1"), ("2", "Deli 2"), ("X7", "Deli X7")]
+    assert not pd.api.types.is_integer_dtype(store.frame["Article"])